@@ -2,12 +2,13 @@
 
 import { revalidatePath } from "next/cache"
 
-export async function generateProblems(difficulty: string, count: number) {
+export async function generateProblems(difficulty: string, count: number, sessionId: string) {
   try {
     const response = await fetch(`${process.env.API_URL}/api/generate`, {
       method: "POST",
       headers: {
         "Content-Type": "application/json",
+        "X-Session-Id": sessionId,
       },
       body: JSON.stringify({ difficulty, count }),
       cache: "no-store",
@@ -27,7 +28,7 @@ export async function generateProblems(difficulty: string, count: number) {
   }
 }
 
-export async function processProblems() {
+export async function processProblems(sessionId: string) {
   try {
     const apiUrl = `${process.env.API_URL}/api/process`;
     console.log(`Sending process request to: ${apiUrl}`);
@@ -36,6 +37,7 @@ export async function processProblems() {
       method: "POST",
       headers: {
         "Content-Type": "application/json",
+        "X-Session-Id": sessionId,
       },
       body: JSON.stringify({}),
       cache: "no-store",
@@ -63,9 +65,12 @@ export async function processProblems() {
   }
 }
 
-export async function getProblem(id: number) {
+export async function getProblem(id: number, sessionId: string) {
   try {
     const response = await fetch(`${process.env.API_URL}/api/problem/${id}`, {
+      headers: {
+        "X-Session-Id": sessionId,
+      },
       cache: "no-store",
     })
 
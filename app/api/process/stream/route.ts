@@ -0,0 +1,28 @@
+// Proxies the backend's NDJSON result stream to the browser. Server actions resolve only once
+// their whole response is in, so the stream is passed through a route handler instead.
+export async function POST(request: Request) {
+  // Pass query options such as moves_encoding through to the backend
+  const { search } = new URL(request.url)
+  const response = await fetch(`${process.env.API_URL}/api/process/stream${search}`, {
+    method: "POST",
+    headers: {
+      "Content-Type": "application/json",
+      "X-Session-Id": request.headers.get("X-Session-Id") ?? "default",
+    },
+    body: JSON.stringify({}),
+    cache: "no-store",
+  })
+
+  if (!response.ok || !response.body) {
+    const errorText = await response.text()
+    return new Response(errorText, { status: response.status })
+  }
+
+  return new Response(response.body, {
+    headers: {
+      "Content-Type": "application/x-ndjson",
+      "Cache-Control": "no-store",
+      "X-Job-Id": response.headers.get("X-Job-Id") ?? "",
+    },
+  })
+}
@@ -0,0 +1,243 @@
+# DESCRIPTION:	Headless benchmark runner for MyAI. Plays World + MyAI over a
+#				subset of the Problems corpus, optionally on several cores,
+#				and reports the win rate, throughput and latency percentiles
+#				of every getAction call and every game. The report can be
+#				written as JSON and compared against an earlier report, so a
+#				performance regression in MyAI fails a command-line check.
+#
+# USAGE:		python Benchmark.py [--difficulty Beginner Expert] [--count 100]
+#				[--workers 4] [--batch] [--cascade] [--output report.json]
+#				[--baseline old.json] [--tolerance 0.1] [--trace trace.json]
+#				[--problems Problems] [--pack Problems.pack]
+#
+# NOTES:		- Boards are read from the pack given with --pack. Without
+#				  it, the default Problems/ directory is read from
+#				  Problems.pack when no world file is newer than the pack,
+#				  and any other --problems directory from its text files.
+#				- Boards are taken in file name order, the same order
+#				  /api/generate uses, so runs are comparable.
+#				- With --batch, World hands MyAI whole batches of percepts
+#				  through getActions, and the action latencies are per batch.
+#				  --cascade also lets World open whole zero regions at once.
+#				- With --trace, every game is traced phase by phase (see
+#				  Tracing.py), the report gains the time and actions per
+#				  phase and the games are written as one Chrome trace, one
+#				  thread per game.
+#				- Exits with status 1 when --baseline is given and a metric
+#				  is worse than the baseline by more than --tolerance.
+
+import argparse
+import json
+import os
+import sys
+import time
+from multiprocessing import Pool
+
+from ProblemPack import ProblemPack, DEFAULT_PACK, packIsCurrent
+from Tracing import Tracer
+from World import World
+
+
+DIFFICULTIES = ["Beginner", "Intermediate", "Expert"]
+DEFAULT_PROBLEMS = "Problems"
+
+# Problem pack opened once per worker process, and its path
+_pack = None
+_packPath = None
+
+
+def choosePack(problemsDir: str, packPath: str = None) -> str:
+	""" Pack to read the boards from: packPath when given, Problems.pack for the default directory while it is up to date, else None """
+	if packPath is not None:
+		return packPath
+	if os.path.normpath(problemsDir) == DEFAULT_PROBLEMS and packIsCurrent(DEFAULT_PACK, problemsDir):
+		return DEFAULT_PACK
+	return None
+
+
+def listBoards(difficulty: str, count: int, problemsDir: str, packPath: str = None) -> "list": # type: ignore
+	""" Names of the first count boards of a difficulty, in file name order, from the pack when one is given """
+	if packPath is not None:
+		pack = ProblemPack(packPath)
+		names = [pack.name(index) for index in pack.find(difficulty)]
+		pack.close()
+	else:
+		names = sorted(f for f in os.listdir(problemsDir) if f.startswith(difficulty) and f.endswith(".txt"))
+	return names if count is None else names[:count]
+
+
+def playGame(task: "tuple") -> dict: # type: ignore
+	""" Play one board and return its outcome, game time and the duration of every call into the agent """
+	global _pack, _packPath
+	difficulty, name, problemsDir, packPath, batch, cascade, trace = task
+	if packPath is not None:
+		if _pack is None or _packPath != packPath:
+			_pack = ProblemPack(packPath)
+			_packPath = packPath
+		world = World.from_pack(_pack, _pack.find(name)[0], batch=batch, cascade=cascade)
+	else:
+		world = World(filename=os.path.join(problemsDir, name), batch=batch, cascade=cascade)
+
+	tracer = Tracer(name).attach(world.getAgent()) if trace else None
+	begin = time.perf_counter()
+	outcome = world.run()
+	game = {
+		"difficulty": difficulty,
+		"name": name,
+		"win": outcome > 0,
+		"seconds": time.perf_counter() - begin,
+		"action_seconds": world.getAgentSeconds(),
+	}
+	if tracer is not None:
+		game["phases"] = tracer.summary()
+		game["trace"] = tracer.chromeTrace()
+	return game
+
+
+def percentiles(values: "list", scale: float) -> dict: # type: ignore
+	""" Nearest-rank p50/p95/p99 of values, multiplied by scale """
+	if not values:
+		return {"p50": None, "p95": None, "p99": None}
+	ordered = sorted(values)
+	result = {}
+	for p in (50, 95, 99):
+		rank = max(0, -(-p * len(ordered) // 100) - 1)
+		result["p" + str(p)] = round(ordered[rank] * scale, 3)
+	return result
+
+
+def mergePhases(games: "list") -> dict: # type: ignore
+	""" Sum the per-phase tracer summaries of traced games """
+	phases = {}
+	for game in games:
+		for phase, entry in game.get("phases", {}).items():
+			total = phases.setdefault(phase, {"ms": 0.0, "calls": 0, "actions": 0})
+			for metric in total:
+				total[metric] += entry[metric]
+	for total in phases.values():
+		total["ms"] = round(total["ms"], 3)
+	return phases
+
+
+def summarise(games: "list") -> dict: # type: ignore
+	""" Aggregate metrics of a group of games """
+	wins = sum(game["win"] for game in games)
+	gameSeconds = [game["seconds"] for game in games]
+	actionSeconds = [t for game in games for t in game["action_seconds"]]
+	return {
+		"games": len(games),
+		"wins": wins,
+		"win_rate": round(wins / len(games), 4) if games else None,
+		"games_per_core_sec": round(len(games) / sum(gameSeconds), 2) if sum(gameSeconds) else None,
+		"actions": len(actionSeconds),
+		"game_latency_ms": percentiles(gameSeconds, 1e3),
+		"action_latency_us": percentiles(actionSeconds, 1e6),
+	}
+
+
+def runBenchmark(difficulties: "list", count: int, workers: int, problemsDir: str = DEFAULT_PROBLEMS, batch: bool = False, cascade: bool = False, trace: str = None,
+				 packPath: str = None) -> dict: # type: ignore
+	""" Play the selected boards, from packPath when given, and build the report, writing a Chrome trace of every game to trace when given """
+	tasks = [(difficulty, name, problemsDir, packPath, batch, cascade, trace is not None)
+			 for difficulty in difficulties for name in listBoards(difficulty, count, problemsDir, packPath)]
+	begin = time.perf_counter()
+	if workers > 1:
+		with Pool(workers) as pool:
+			games = pool.map(playGame, tasks, chunksize=max(1, len(tasks) // (workers * 8)))
+	else:
+		games = [playGame(task) for task in tasks]
+	wallSeconds = time.perf_counter() - begin
+
+	report = {
+		"settings": {"difficulties": difficulties, "count": count, "workers": workers, "batch": batch, "cascade": cascade, "pack": packPath},
+		"wall_seconds": round(wallSeconds, 3),
+		"games_per_sec": round(len(games) / wallSeconds, 2) if wallSeconds else None,
+		"total": summarise(games),
+		"difficulties": {},
+	}
+	for difficulty in difficulties:
+		report["difficulties"][difficulty] = summarise([game for game in games if game["difficulty"] == difficulty])
+
+	if trace is not None:
+		report["phases"] = mergePhases(games)
+		events = []
+		for tid, game in enumerate(games, 1):
+			events.extend({**event, "tid": tid} for event in game["trace"])
+		with open(trace, "w") as file:
+			json.dump({"traceEvents": events, "displayTimeUnit": "ms"}, file)
+	return report
+
+
+def findRegressions(report: dict, baseline: dict, tolerance: float) -> "list": # type: ignore
+	""" Describe every metric that is worse than the baseline by more than tolerance """
+	regressions = []
+	for group, current in report["difficulties"].items():
+		previous = baseline.get("difficulties", {}).get(group)
+		if not previous:
+			continue
+		if current["win_rate"] is not None and previous["win_rate"] is not None:
+			if current["win_rate"] < previous["win_rate"] - tolerance:
+				regressions.append(f"{group} win rate {current['win_rate']} < {previous['win_rate']}")
+		if current["games_per_core_sec"] and previous["games_per_core_sec"]:
+			if current["games_per_core_sec"] < previous["games_per_core_sec"] * (1 - tolerance):
+				regressions.append(f"{group} games/core-sec {current['games_per_core_sec']} < {previous['games_per_core_sec']}")
+		for metric in ("game_latency_ms", "action_latency_us"):
+			for p in ("p50", "p95", "p99"):
+				now, before = current[metric][p], previous[metric][p]
+				if now is not None and before and now > before * (1 + tolerance):
+					regressions.append(f"{group} {metric} {p} {now} > {before}")
+	return regressions
+
+
+def printReport(report: dict) -> None:
+	""" Print a human readable table of the report """
+	print("difficulty       games   win rate   games/core-s   game p50/p95/p99 ms        action p50/p95/p99 us")
+	rows = list(report["difficulties"].items()) + [("total", report["total"])]
+	for group, summary in rows:
+		game = summary["game_latency_ms"]
+		action = summary["action_latency_us"]
+		print(f"{group:<14} {summary['games']:>7} {summary['win_rate']:>10} {summary['games_per_core_sec']:>14}"
+			f"   {game['p50']}/{game['p95']}/{game['p99']:<16} {action['p50']}/{action['p95']}/{action['p99']}")
+	if "phases" in report:
+		print("phase                    ms    calls  actions")
+		for phase, entry in sorted(report["phases"].items(), key=lambda item: -item[1]["ms"]):
+			print(f"{phase:<18} {entry['ms']:>10.1f} {entry['calls']:>8} {entry['actions']:>8}")
+	print(f"{report['total']['games']} games in {report['wall_seconds']} s ({report['games_per_sec']} games/s)")
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Benchmark MyAI over the Problems corpus")
+	parser.add_argument("--difficulty", help="Difficulties to run", nargs="+", choices=DIFFICULTIES, default=DIFFICULTIES)
+	parser.add_argument("--count", help="Boards per difficulty (default: all)", type=int, default=None)
+	parser.add_argument("--workers", help="Worker processes, 0 for one per core", type=int, default=1)
+	parser.add_argument("--batch", help="Let MyAI return batches of actions through getActions", action="store_true")
+	parser.add_argument("--cascade", help="Let World open whole zero regions at once, implies --batch", action="store_true")
+	parser.add_argument("--problems", help="Directory holding the world files", default=DEFAULT_PROBLEMS)
+	parser.add_argument("--pack", help="Problem pack to read the boards from instead of the world files")
+	parser.add_argument("--output", help="Write the JSON report to this path")
+	parser.add_argument("--baseline", help="JSON report to compare against")
+	parser.add_argument("--trace", help="Trace the solver phases and write a Chrome trace JSON to this path")
+	parser.add_argument("--tolerance", help="Allowed relative slowdown / absolute win rate drop", type=float, default=0.1)
+	args = parser.parse_args()
+
+	workers = args.workers or os.cpu_count() or 1
+	packPath = choosePack(args.problems, args.pack)
+	report = runBenchmark(args.difficulty, args.count, workers, args.problems, args.batch, args.cascade, args.trace, packPath)
+	printReport(report)
+
+	if args.output:
+		with open(args.output, "w") as file:
+			json.dump(report, file, indent=2)
+
+	if args.baseline:
+		with open(args.baseline, "r") as file:
+			baseline = json.load(file)
+		regressions = findRegressions(report, baseline, args.tolerance)
+		for regression in regressions:
+			print("REGRESSION: " + regression)
+		if regressions:
+			sys.exit(1)
+
+
+if __name__ == "__main__":
+	main()
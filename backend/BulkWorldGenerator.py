@@ -0,0 +1,257 @@
+# DESCRIPTION:	Bulk counterpart of WorldGenerator.py for building large
+#				corpora. Every board draws its start tile and then its mines
+#				without replacement from the tiles outside the start patch,
+#				from its own random stream, so the boards are the same for a
+#				given seed no matter how many worker processes generate
+#				them. Boards are written either as world files in the
+#				WorldGenerator format, one buffered write per file, or
+#				straight into a single ProblemPack file.
+#
+#				With --no-guess, every board can be solved from its start
+#				tile by deduction alone. A built-in solver plays the board
+#				with the same ConstraintGraph, propagation and Gaussian
+#				elimination MyAI uses; where it gets stuck, one mine of the
+#				undecided region is moved elsewhere and the board is tried
+#				again, so a layout is repaired instead of drawn again.
+#
+# USAGE:		python BulkWorldGenerator.py numFiles filename rowDimension
+#				colDimension numMines [--seed 0] [--workers 0]
+#				[--format text|pack] [--output path] [--no-guess]
+#
+# NOTES:		- Board i uses the random stream SeedSequence(seed,
+#				  spawn_key=(i,)), the i-th child of SeedSequence(seed).
+#				- Like WorldGenerator, world files go to Problems/<difficulty>
+#				  when that directory exists and to Problems/ otherwise;
+#				  --output picks another directory.
+#				- A pack is written in file name order, as ProblemPack
+#				  expects, and defaults to <filename>.pack.
+
+import argparse
+import os
+import time
+from multiprocessing import Pool
+
+import numpy as np
+
+from ConstraintGraph import ConstraintGraph
+from ConstraintPropagator import propagate
+from GaussianElimination import deduce
+from ProblemPack import HEADER, RECORD, MAGIC, VERSION
+
+
+# Boards handed to a worker at a time
+CHUNK_SIZE = 1000
+
+# Mine moves tried on one no-guess layout before a new layout is drawn. Layouts that are still stuck
+# after a few moves tend to stay stuck, so drawing again beats repairing on
+MAX_REPAIRS = 10
+
+
+def boardRandom(seed: int, index: int) -> np.random.Generator:
+	""" Random stream of board index, independent of how the boards are split over workers """
+	return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(index,)))
+
+
+def generateBoard(rng: np.random.Generator, rowDimension: int, colDimension: int, numMines: int) -> "tuple": # type: ignore
+	"""
+	Draw one board: (startX, startY, mask), with a 0-indexed start in World orientation (y = 0 is the bottom
+	row) and a rows x cols 0/1 mask in world file line order (line 0 is the top row)
+	"""
+	startX = int(rng.integers(colDimension))
+	startY = int(rng.integers(rowDimension))
+	startLine = rowDimension - 1 - startY
+
+	# The start tile and its neighbours never hold a mine
+	allowed = np.ones((rowDimension, colDimension), dtype=bool)
+	allowed[max(0, startLine - 1):startLine + 2, max(0, startX - 1):startX + 2] = False
+	candidates = np.flatnonzero(allowed)
+
+	mask = np.zeros(rowDimension * colDimension, dtype=np.uint8)
+	mask[rng.choice(candidates, size=numMines, replace=False)] = 1
+	return startX, startY, mask.reshape(rowDimension, colDimension)
+
+
+def deductionSolve(mask: np.ndarray, startLine: int, startX: int) -> "tuple": # type: ignore
+	"""
+	Play a board by propagation and Gaussian elimination alone, tiles as (line, column). Returns (stuck, unknown):
+	stuck is empty when the board is solved, otherwise the undecided tiles to repair around
+	"""
+	rows, cols = mask.shape
+	padded = np.pad(mask, 1).astype(np.int16)
+	numbers = (sum(padded[dr:dr + rows, dc:dc + cols] for dr in range(3) for dc in range(3)) - mask).tolist()
+	unknown = {(r, c) for r in range(rows) for c in range(cols)}
+	flagged = set()
+	minesLeft = int(mask.sum())
+	graph = ConstraintGraph()
+
+	def neighbours(r, c):
+		return [(r + dr, c + dc) for dr in (-1, 0, 1) for dc in (-1, 0, 1)
+				if (dr or dc) and 0 <= r + dr < rows and 0 <= c + dc < cols]
+
+	def reveal(tile):
+		stack = [tile]
+		while stack:
+			r, c = stack.pop()
+			if (r, c) not in unknown:
+				continue
+			unknown.discard((r, c))
+			graph.removeTile((r, c), False)
+			around = neighbours(r, c)
+			if numbers[r][c] == 0:
+				stack.extend(around)
+			else:
+				covered = [tile for tile in around if tile in unknown]
+				graph.addConstraint((r, c), covered, numbers[r][c] - sum(tile in flagged for tile in around))
+
+	reveal((startLine, startX))
+	# Once the unknown tiles are all mines or all safe, the mine count decides the rest
+	while minesLeft and len(unknown) > minesLeft:
+		safe, mines = propagate(graph)
+		if not safe and not mines:
+			frontierOnly = len(graph.tileCells) == len(unknown)
+			safe, mines = deduce(graph, minesLeft if frontierOnly else None)
+		if not safe and not mines:
+			stuck = sorted(graph.tileCells)
+			if not stuck:
+				# Nothing constrained is left: the unknown region is walled off by flagged mines
+				stuck = sorted(tile for tile in flagged if any(n in unknown for n in neighbours(*tile)))
+			return stuck, unknown
+		for tile in mines:
+			unknown.discard(tile)
+			flagged.add(tile)
+			minesLeft -= 1
+		for tile in safe:
+			reveal(tile)
+	return [], unknown
+
+
+def repairBoard(rng: np.random.Generator, mask: np.ndarray, stuck: "list", unknown: set) -> None: # type: ignore
+	""" Move one mine in or out of a random stuck tile, to or from the undecided tiles away from it """
+	tile = stuck[rng.integers(len(stuck))]
+	stuckTiles = set(stuck)
+	away = sorted(other for other in unknown if other not in stuckTiles) or sorted(unknown - {tile})
+	candidates = [other for other in away if mask[other] != mask[tile]]
+	if candidates:
+		other = candidates[rng.integers(len(candidates))]
+		mask[tile], mask[other] = mask[other], mask[tile]
+
+
+def generateNoGuessBoard(rng: np.random.Generator, rowDimension: int, colDimension: int, numMines: int) -> "tuple": # type: ignore
+	""" Draw a board, as generateBoard, that deduction alone solves from its start tile """
+	while True:
+		startX, startY, mask = generateBoard(rng, rowDimension, colDimension, numMines)
+		startLine = rowDimension - 1 - startY
+		for _ in range(MAX_REPAIRS):
+			stuck, unknown = deductionSolve(mask, startLine, startX)
+			if not stuck:
+				return startX, startY, mask
+			repairBoard(rng, mask, stuck, unknown)
+
+
+def worldText(rowDimension: int, colDimension: int, startX: int, startY: int, mask: np.ndarray) -> bytes:
+	""" World file contents in the WorldGenerator format, start written 1-indexed """
+	cells = np.full((rowDimension, colDimension * 2 + 1), ord(" "), dtype=np.uint8)
+	cells[:, 0:-1:2] = mask + ord("0")
+	cells[:, -1] = ord("\n")
+	header = f"{rowDimension} {colDimension}\n{startX + 1} {startY + 1}\n".encode("ascii")
+	return header + cells.tobytes()
+
+
+def generateChunk(task: "tuple") -> list: # type: ignore
+	""" Generate boards first..last-1: write them to outputDir as world files, or return them for a pack when it is None """
+	seed, first, last, baseFileName, rowDimension, colDimension, numMines, outputDir, noGuess = task
+	generate = generateNoGuessBoard if noGuess else generateBoard
+	boards = []
+	for i in range(first, last):
+		startX, startY, mask = generate(boardRandom(seed, i), rowDimension, colDimension, numMines)
+		name = baseFileName + str(i + 1) + ".txt"
+		if outputDir is None:
+			boards.append((name, startX, startY, np.packbits(mask, axis=None, bitorder="little").tobytes()))
+		else:
+			with open(os.path.join(outputDir, name), "wb") as file:
+				file.write(worldText(rowDimension, colDimension, startX, startY, mask))
+	return boards
+
+
+def generateWorlds(numWorlds: int, baseFileName: str, rowDimension: int, colDimension: int, numMines: int,
+				   seed: int = 0, workers: int = 1, outputDir: str = None, packPath: str = None, noGuess: bool = False) -> int:
+	""" Generate numWorlds boards into outputDir as world files, or into packPath as a ProblemPack; returns the count """
+	target = None if packPath is not None else outputDir
+	tasks = [(seed, first, min(first + CHUNK_SIZE, numWorlds), baseFileName, rowDimension, colDimension, numMines, target, noGuess)
+			 for first in range(0, numWorlds, CHUNK_SIZE)]
+	if workers > 1:
+		with Pool(workers) as pool:
+			chunks = pool.map(generateChunk, tasks)
+	else:
+		chunks = [generateChunk(task) for task in tasks]
+
+	if packPath is not None:
+		writePack(packPath, [board for chunk in chunks for board in chunk], rowDimension, colDimension, numMines)
+	return numWorlds
+
+
+def writePack(path: str, boards: "list", rowDimension: int, colDimension: int, numMines: int) -> None: # type: ignore
+	""" Write (name, startX, startY, mask bytes) boards as a ProblemPack, sorted by name """
+	boards.sort(key=lambda board: board[0])
+	records = []
+	offset = HEADER.size + RECORD.size * len(boards)
+	for name, startX, startY, mask in boards:
+		encoded = name.encode("utf-8")
+		if len(encoded) > 32:
+			raise ValueError("World file name too long to pack: " + name)
+		records.append(RECORD.pack(encoded, rowDimension, colDimension, startX, startY, numMines, 0, offset))
+		offset += len(mask)
+
+	# Write to a temporary file first so readers never map a half-written pack
+	tempPath = path + ".tmp"
+	with open(tempPath, "wb") as file:
+		file.write(HEADER.pack(MAGIC, VERSION, 0, len(boards)))
+		file.write(b"".join(records))
+		file.write(b"".join(board[3] for board in boards))
+	os.replace(tempPath, path)
+
+
+def defaultDirectory(baseFileName: str) -> str:
+	""" Problems/<difficulty> when it exists, Problems/ otherwise, as WorldGenerator does """
+	problemsDir = os.path.abspath("Problems")
+	difficultyDir = os.path.join(problemsDir, baseFileName.split("_", 1)[0])
+	return difficultyDir if os.path.isdir(difficultyDir) else problemsDir
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Generate many worlds at once, reproducibly from a seed")
+	parser.add_argument("numFiles", help="Number of worlds to create", type=int)
+	parser.add_argument("filename", help="Base filename", action="store")
+	parser.add_argument("rowDimension", help="Number of rows", type=int)
+	parser.add_argument("colDimension", help="Number of columns", type=int)
+	parser.add_argument("numMines", help="Number of mines", type=int)
+	parser.add_argument("--seed", help="Seed of the whole corpus", type=int, default=0)
+	parser.add_argument("--workers", help="Worker processes, 0 for one per core", type=int, default=0)
+	parser.add_argument("--format", help="World files or a single problem pack", choices=["text", "pack"], default="text")
+	parser.add_argument("--output", help="Directory of the world files, or path of the pack")
+	parser.add_argument("--no-guess", help="Only emit boards that can be solved without guessing", action="store_true")
+	args = parser.parse_args()
+
+	if not (args.rowDimension >= 4 and args.colDimension >= 4 and 1 <= args.numMines <= args.rowDimension * args.colDimension - 9):
+		print("ERROR: Could not generate worlds! \n\trowDimension >= 4, colDimension >= 4, 1 <= numMines <= (rowDimension*colDimension - 9)")
+		return
+
+	workers = args.workers or os.cpu_count() or 1
+	begin = time.perf_counter()
+	if args.format == "pack":
+		packPath = args.output or args.filename.rstrip("_") + ".pack"
+		count = generateWorlds(args.numFiles, args.filename, args.rowDimension, args.colDimension, args.numMines,
+							   args.seed, workers, packPath=packPath, noGuess=args.no_guess)
+		print("Packed " + str(count) + " worlds into " + packPath)
+	else:
+		outputDir = args.output or defaultDirectory(args.filename)
+		os.makedirs(outputDir, exist_ok=True)
+		count = generateWorlds(args.numFiles, args.filename, args.rowDimension, args.colDimension, args.numMines,
+							   args.seed, workers, outputDir=outputDir, noGuess=args.no_guess)
+		print("Created " + str(count) + " worlds in " + outputDir)
+	seconds = time.perf_counter() - begin
+	print(f"{seconds:.2f} s, {count / seconds:.1f} boards/s")
+
+
+if __name__ == "__main__":
+	main()
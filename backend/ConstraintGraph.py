@@ -0,0 +1,148 @@
+# DESCRIPTION:	This file contains the ConstraintGraph class, which keeps the
+#				frontier constraints of MyAI alive between getAction calls.
+#				Every uncovered number that still touches covered tiles is a
+#				constraint "these tiles hold this many mines". Tiles that
+#				share a constraint are joined in a union-find structure so
+#				the connected frontiers are available without a rebuild.
+#
+# NOTES:		- Union-find cannot split sets, so removing a tile only marks
+#				  its component dirty. Dirty components are re-split lazily,
+#				  by a BFS over their own tiles, the next time components()
+#				  is called.
+#				- changedCells collects the constraints that were added or
+#				  changed since a consumer last took them out, so deduction
+#				  passes only need to look at what changed.
+
+
+class ConstraintGraph():
+
+	def __init__(self):
+		self.cellTiles = {}			# numbered cell -> covered tiles it constrains
+		self.cellMines = {}			# numbered cell -> mines left among those tiles
+		self.tileCells = {}			# covered frontier tile -> numbered cells touching it
+		self.changedCells = {}		# cells changed since last consumed, used as an ordered set
+
+		self.__parent = {}			# union-find parent of every frontier tile
+		self.__members = {}			# component root -> live tiles of the component
+		self.__dirtyRoots = set()	# components that lost a tile and may have split
+		self.__removedTiles = set()	# removed tiles still referenced by the union-find
+
+
+	def addConstraint(self, cell: "tuple", tiles: "iterable", mines: int) -> None: # type: ignore
+		""" Register an uncovered number and the covered tiles around it """
+		tiles = set(tiles)
+		if not tiles:
+			return
+		self.cellTiles[cell] = tiles
+		self.cellMines[cell] = mines
+		self.changedCells[cell] = None
+
+		first = None
+		for tile in tiles:
+			self.tileCells.setdefault(tile, set()).add(cell)
+			if tile not in self.__parent:
+				self.__parent[tile] = tile
+				self.__members[tile] = {tile: None}
+			if first is None:
+				first = tile
+			else:
+				self.__union(first, tile)
+
+
+	def removeTile(self, tile: "tuple", isMine: bool) -> None: # type: ignore
+		""" Take a tile off the frontier once it is known to be safe or a mine, removing it twice is a no-op """
+		for cell in self.tileCells.pop(tile, ()):
+			tiles = self.cellTiles[cell]
+			tiles.discard(tile)
+			if isMine:
+				self.cellMines[cell] -= 1
+			if tiles:
+				self.changedCells[cell] = None
+			else:
+				del self.cellTiles[cell]
+				del self.cellMines[cell]
+				self.changedCells.pop(cell, None)
+
+		if tile in self.__parent and tile not in self.__removedTiles:
+			root = self.__find(tile)
+			del self.__members[root][tile]
+			self.__dirtyRoots.add(root)
+			self.__removedTiles.add(tile)
+
+
+	def overlappingCells(self, cell: "tuple") -> set: # type: ignore
+		""" Constraints sharing at least one covered tile with the given constraint """
+		cells = set()
+		for tile in self.cellTiles.get(cell, ()):
+			cells.update(self.tileCells[tile])
+		cells.discard(cell)
+		return cells
+
+
+	def components(self) -> "list": # type: ignore
+		""" Return every connected frontier as (tiles, cells), splitting components that lost tiles """
+		for root in self.__dirtyRoots:
+			self.__split(root)
+		self.__dirtyRoots.clear()
+		for tile in self.__removedTiles:
+			del self.__parent[tile]
+		self.__removedTiles.clear()
+
+		components = []
+		for members in self.__members.values():
+			cells = {}
+			for tile in members:
+				for cell in self.tileCells[tile]:
+					cells[cell] = None
+			components.append((list(members), list(cells)))
+		return components
+
+
+	#####################################################
+	#		         UNION-FIND HELPERS					#
+	#####################################################
+	def __find(self, tile: "tuple") -> "tuple": # type: ignore
+		""" Root of the component holding tile, compressing the path on the way """
+		root = tile
+		while self.__parent[root] != root:
+			root = self.__parent[root]
+		while self.__parent[tile] != root:
+			self.__parent[tile], tile = root, self.__parent[tile]
+		return root
+
+
+	def __union(self, a: "tuple", b: "tuple") -> None: # type: ignore
+		""" Merge the components of a and b, keeping the larger one's root """
+		rootA = self.__find(a)
+		rootB = self.__find(b)
+		if rootA == rootB:
+			return
+		if len(self.__members[rootA]) < len(self.__members[rootB]):
+			rootA, rootB = rootB, rootA
+		self.__parent[rootB] = rootA
+		self.__members[rootA].update(self.__members.pop(rootB))
+		if rootB in self.__dirtyRoots:
+			self.__dirtyRoots.discard(rootB)
+			self.__dirtyRoots.add(rootA)
+
+
+	def __split(self, root: "tuple") -> None: # type: ignore
+		""" Recompute the connected pieces of a component after tiles were removed from it """
+		members = self.__members.pop(root, None)
+		if not members:
+			return
+		unvisited = set(members)
+		for start in members:
+			if start not in unvisited:
+				continue
+			unvisited.discard(start)
+			piece = [start]
+			for tile in piece:
+				for cell in self.tileCells[tile]:
+					for neighbor in self.cellTiles[cell]:
+						if neighbor in unvisited:
+							unvisited.discard(neighbor)
+							piece.append(neighbor)
+			for tile in piece:
+				self.__parent[tile] = start
+			self.__members[start] = dict.fromkeys(piece)
@@ -0,0 +1,70 @@
+# DESCRIPTION:	This file contains the deterministic deduction engine used by
+#				MyAI before it falls back to searching. It works through the
+#				constraints a ConstraintGraph reports as changed, applying
+#				the single-cell rule and the pairwise subset/superset/overlap
+#				rule. Every tile it resolves is taken off the graph, which
+#				puts the constraints around that tile back on the worklist,
+#				so the loop runs until no constraint can deduce anything new.
+
+
+def compare_constraints(graph: "ConstraintGraph", a: "tuple", b: "tuple") -> "tuple": # type: ignore
+	"""
+	Pairwise rule for two overlapping constraints. If a needs as many more mines than b as it has
+	tiles outside b, those tiles are all mines and b's tiles outside a are all safe. With a subset
+	one of the differences is empty, which gives the subset/superset rules. Returns (safe, mines).
+	"""
+	a_tiles, b_tiles = graph.cellTiles[a], graph.cellTiles[b]
+	a_not_b = a_tiles - b_tiles
+	b_not_a = b_tiles - a_tiles
+	if not a_not_b and not b_not_a:
+		return (), ()
+	if graph.cellMines[a] - graph.cellMines[b] == len(a_not_b):
+		return b_not_a, a_not_b
+	if graph.cellMines[b] - graph.cellMines[a] == len(b_not_a):
+		return a_not_b, b_not_a
+	return (), ()
+
+
+def propagate(graph: "ConstraintGraph") -> "tuple": # type: ignore
+	""" Deduce tiles from changed constraints until a fixed point, returning (safe, mines) as ordered sets """
+	safe = {}
+	mines = {}
+
+	def resolve(tiles, isMine):
+		for tile in list(tiles):
+			(mines if isMine else safe)[tile] = None
+			graph.removeTile(tile, isMine)
+
+	worklist = graph.changedCells
+	while worklist:
+		cell = worklist.popitem()[0]
+		tiles = graph.cellTiles.get(cell)
+		if not tiles:
+			continue
+		required = graph.cellMines[cell]
+		# An inconsistent constraint can't support any deduction
+		if required < 0 or required > len(tiles):
+			continue
+
+		# Single-cell rule
+		if required == 0:
+			resolve(tiles, False)
+			continue
+		if required == len(tiles):
+			resolve(tiles, True)
+			continue
+
+		# Pairwise rules against every overlapping constraint. A deduction changes the graph under the
+		# loop, so stop at the first one and put this constraint back on the worklist to finish it later
+		for other in graph.overlappingCells(cell):
+			if graph.cellMines[other] < 0 or graph.cellMines[other] > len(graph.cellTiles[other]):
+				continue
+			safe_tiles, mine_tiles = compare_constraints(graph, cell, other)
+			if safe_tiles or mine_tiles:
+				resolve(mine_tiles, True)
+				resolve(safe_tiles, False)
+				if cell in graph.cellTiles:
+					worklist[cell] = None
+				break
+
+	return safe, mines
@@ -0,0 +1,102 @@
+# DESCRIPTION:	This file contains the linear-algebra deduction pass MyAI runs
+#				after constraint propagation and before enumerating the
+#				frontier. Every constraint of a ConstraintGraph is a row of a
+#				0/1 matrix over the frontier tiles; the matrix is brought to
+#				reduced row echelon form with fraction-free integer row
+#				operations and every reduced row is checked with bound
+#				reasoning: when the right-hand side equals the smallest or
+#				largest value the row can take with 0/1 tiles, every tile in
+#				the row is forced.
+
+from math import gcd
+
+
+def reduce_rows(rows: "list", columns: int) -> "list": # type: ignore
+	""" Bring integer rows [a_0, ..., a_n-1, b] to reduced row echelon form, in place """
+	pivot = 0
+	for column in range(columns):
+		if pivot == len(rows):
+			break
+		for r in range(pivot, len(rows)):
+			if rows[r][column]:
+				rows[pivot], rows[r] = rows[r], rows[pivot]
+				break
+		else:
+			continue
+
+		pivot_row = rows[pivot]
+		for r, row in enumerate(rows):
+			if r != pivot and row[column]:
+				factor = row[column]
+				row = [value * pivot_row[column] - pivot_value * factor for value, pivot_value in zip(row, pivot_row)]
+				# Keep coefficients small by dividing out the common factor
+				divisor = 0
+				for value in row:
+					divisor = gcd(divisor, value)
+				if divisor > 1:
+					row = [value // divisor for value in row]
+				rows[r] = row
+		pivot += 1
+	return rows
+
+
+def forced_tiles(row: "list") -> "tuple": # type: ignore
+	""" Bound reasoning on one row: return (indices forced to 0, indices forced to 1) """
+	coefficients, target = row[:-1], row[-1]
+	lowest = sum(value for value in coefficients if value < 0)
+	highest = sum(value for value in coefficients if value > 0)
+	if lowest == highest:
+		return (), ()
+	positive = [i for i, value in enumerate(coefficients) if value > 0]
+	negative = [i for i, value in enumerate(coefficients) if value < 0]
+	if target == lowest:
+		return positive, negative
+	if target == highest:
+		return negative, positive
+	return (), ()
+
+
+def deduce(graph: "ConstraintGraph", mines_remaining: int = None) -> "tuple": # type: ignore
+	"""
+	Run the elimination on every connected frontier and return (safe, mines) as ordered sets. Resolved
+	tiles are taken off the graph. When mines_remaining is given, every covered tile is on the frontier
+	and the total is added as one more row, which couples all components into a single system.
+	"""
+	safe = {}
+	mines = {}
+
+	systems = graph.components()
+	if mines_remaining is not None:
+		tiles = [tile for component_tiles, _ in systems for tile in component_tiles]
+		cells = [cell for _, component_cells in systems for cell in component_cells]
+		systems = [(tiles, cells)]
+
+	for tiles, cells in systems:
+		index = {tile: i for i, tile in enumerate(tiles)}
+		rows = []
+		for cell in cells:
+			row = [0] * (len(tiles) + 1)
+			for tile in graph.cellTiles[cell]:
+				row[index[tile]] = 1
+			row[-1] = graph.cellMines[cell]
+			rows.append(row)
+		if mines_remaining is not None:
+			rows.append([1] * len(tiles) + [mines_remaining])
+
+		for row in reduce_rows(rows, len(tiles)):
+			zeros, ones = forced_tiles(row)
+			for i in zeros:
+				safe[tiles[i]] = None
+			for i in ones:
+				mines[tiles[i]] = None
+
+	# Rows of an inconsistent system can disagree; such tiles are left to the search
+	for tile in safe.keys() & mines.keys():
+		del safe[tile]
+		del mines[tile]
+
+	for tile in mines:
+		graph.removeTile(tile, True)
+	for tile in safe:
+		graph.removeTile(tile, False)
+	return safe, mines
@@ -0,0 +1,156 @@
+# DESCRIPTION:	This file contains the job subsystem behind the /api/jobs
+#				endpoints. A Job solves a batch of problems on the solver
+#				pool in the background and keeps its results as they come
+#				in, so clients can poll its progress, subscribe to its
+#				results, fetch them later or cancel it. Jobs and the
+#				per-session generated problems are held in BoundedStores,
+#				which drop the least recently used entries once they are
+#				full or have not been touched for a while.
+
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+
+
+class BoundedStore():
+
+	def __init__(self, maxItems: int, ttl: float, onEvict=None):
+		self.maxItems = maxItems	# entries kept before the least recently used is dropped
+		self.ttl = ttl				# seconds an entry survives without being touched
+		self.__onEvict = onEvict	# called with every value that is dropped
+		self.__items = OrderedDict()	# key -> (value, last touched), least recently used first
+
+
+	def __len__(self) -> int:
+		self.__evict()
+		return len(self.__items)
+
+
+	def get(self, key: str):
+		""" Value stored under key, or None if there is none or it has expired """
+		self.__evict()
+		if key not in self.__items:
+			return None
+		value, _ = self.__items[key]
+		self.__items[key] = (value, time.monotonic())
+		self.__items.move_to_end(key)
+		return value
+
+
+	def put(self, key: str, value) -> None:
+		""" Store value under key as the most recently used entry """
+		self.__items.pop(key, None)
+		self.__items[key] = (value, time.monotonic())
+		self.__evict()
+
+
+	def pop(self, key: str):
+		""" Remove and return the value under key, or None; the eviction callback is not called """
+		return self.__items.pop(key, (None, None))[0]
+
+
+	def __evict(self) -> None:
+		""" Drop expired entries, then the least recently used ones until the store fits """
+		deadline = time.monotonic() - self.ttl
+		while self.__items:
+			key, (value, touched) = next(iter(self.__items.items()))
+			if touched >= deadline and len(self.__items) <= self.maxItems:
+				break
+			del self.__items[key]
+			if self.__onEvict is not None:
+				self.__onEvict(value)
+
+
+class Job():
+
+	def __init__(self, session: str, problems: list):
+		self.id = uuid.uuid4().hex
+		self.session = session		# session that created the job, the only one allowed to see it
+		self.problems = problems
+		self.results = []			# results in the order their games finished
+		self.status = "queued"		# queued, running, done, cancelled or error
+		self.error = None
+		self.created = time.time()
+		self.task = None
+
+		self.__futures = []
+		self.__changed = asyncio.Condition()
+
+
+	@property
+	def finished(self) -> bool:
+		return self.status in ("done", "cancelled", "error")
+
+
+	def start(self, solve) -> None:
+		""" Start solving every problem with the coroutine function solve, in the background of the running event loop """
+		self.task = asyncio.get_running_loop().create_task(self.__run(solve))
+
+
+	def cancel(self) -> None:
+		""" Stop the job; games already running in a worker finish, queued ones are dropped """
+		if self.finished:
+			return
+		for future in self.__futures:
+			future.cancel()
+		if self.task is not None:
+			self.task.cancel()
+		else:
+			self.status = "cancelled"
+
+
+	def progress(self) -> dict:
+		""" Status summary of the job """
+		outcomes = {}
+		for result in self.results:
+			outcomes[result["outcome"]] = outcomes.get(result["outcome"], 0) + 1
+		return {
+			"job_id": self.id,
+			"status": self.status,
+			"total": len(self.problems),
+			"completed": len(self.results),
+			"outcomes": outcomes,
+			"error": self.error,
+		}
+
+
+	def sortedResults(self) -> list:
+		""" Results finished so far, ordered by problem id """
+		return sorted(self.results, key=lambda result: result["id"])
+
+
+	async def events(self, offset: int = 0):
+		""" Yield every result from position offset on, waiting for new ones until the job finishes """
+		while True:
+			async with self.__changed:
+				await self.__changed.wait_for(lambda: len(self.results) > offset or self.finished)
+			while offset < len(self.results):
+				yield self.results[offset]
+				offset += 1
+			if self.finished and offset == len(self.results):
+				return
+
+
+	async def __run(self, solve) -> None:
+		self.status = "running"
+		self.__futures = [asyncio.ensure_future(solve(problem)) for problem in self.problems]
+		try:
+			for future in asyncio.as_completed(self.__futures):
+				self.results.append(await future)
+				await self.__notify()
+			self.status = "done"
+		except asyncio.CancelledError:
+			self.status = "cancelled"
+		except Exception as e:
+			self.status = "error"
+			self.error = str(e)
+		finally:
+			for future in self.__futures:
+				future.cancel()
+			await self.__notify()
+
+
+	async def __notify(self) -> None:
+		async with self.__changed:
+			self.__changed.notify_all()
@@ -0,0 +1,167 @@
+# DESCRIPTION:	This file contains the metric types behind /api/metrics: a
+#				Counter, a Gauge and a Histogram, all with optional labels,
+#				and a Registry that renders them in the Prometheus text
+#				exposition format. Histograms can be snapshotted in one
+#				process and merged into another, which is how the solver
+#				pool workers hand their per-move timings back to the API.
+#
+# NOTES:		- Metric names follow the Prometheus conventions: counters
+#				  end in _total and durations are in seconds.
+#				- Nothing here is thread safe; the API only updates metrics
+#				  from the event loop.
+
+import bisect
+import math
+
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Bucket upper bounds in seconds
+REQUEST_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+GAME_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 10)
+MOVE_BUCKETS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.01, 0.1, 1)
+
+
+def formatLabels(names: "tuple", values: "tuple", extra: str = "") -> str: # type: ignore
+	""" Prometheus label set, such as {route="/api/process",le="0.5"} """
+	pairs = [f'{name}="{escape(value)}"' for name, value in zip(names, values)]
+	if extra:
+		pairs.append(extra)
+	return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def escape(value) -> str:
+	return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def formatValue(value: float) -> str:
+	if math.isinf(value):
+		return "+Inf" if value > 0 else "-Inf"
+	return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter():
+
+	type = "counter"
+
+	def __init__(self, name: str, help: str, labels: "tuple" = ()): # type: ignore
+		self.name = name
+		self.help = help
+		self.labels = tuple(labels)
+		self.values = {}		# label values -> count
+
+
+	def inc(self, amount: float = 1, **labels) -> None:
+		key = tuple(labels[name] for name in self.labels)
+		self.values[key] = self.values.get(key, 0) + amount
+
+
+	def samples(self) -> "list": # type: ignore
+		return [(self.name, formatLabels(self.labels, key), value) for key, value in self.values.items()]
+
+
+class Gauge():
+
+	type = "gauge"
+
+	def __init__(self, name: str, help: str, labels: "tuple" = (), function=None): # type: ignore
+		self.name = name
+		self.help = help
+		self.labels = tuple(labels)
+		self.values = {}				# label values -> value
+		self.__function = function		# called at render time for a gauge without labels, instead of set values
+
+
+	def set(self, value: float, **labels) -> None:
+		self.values[tuple(labels[name] for name in self.labels)] = value
+
+
+	def inc(self, amount: float = 1, **labels) -> None:
+		key = tuple(labels[name] for name in self.labels)
+		self.values[key] = self.values.get(key, 0) + amount
+
+
+	def dec(self, amount: float = 1, **labels) -> None:
+		self.inc(-amount, **labels)
+
+
+	def samples(self) -> "list": # type: ignore
+		if self.__function is not None:
+			return [(self.name, "", self.__function())]
+		return [(self.name, formatLabels(self.labels, key), value) for key, value in self.values.items()]
+
+
+class Histogram():
+
+	type = "histogram"
+
+	def __init__(self, name: str, help: str, buckets: "tuple" = REQUEST_BUCKETS, labels: "tuple" = ()): # type: ignore
+		self.name = name
+		self.help = help
+		self.buckets = tuple(buckets)
+		self.labels = tuple(labels)
+		self.values = {}		# label values -> [count per bucket plus one for +Inf, sum]
+
+
+	def observe(self, value: float, **labels) -> None:
+		state = self.__state(labels)
+		state[0][bisect.bisect_left(self.buckets, value)] += 1
+		state[1] += value
+
+
+	def snapshot(self, **labels) -> "tuple": # type: ignore
+		""" (count per bucket, sum) of one label set, picklable so it can leave a worker process """
+		counts, total = self.__state(labels)
+		return list(counts), total
+
+
+	def merge(self, snapshot: "tuple", **labels) -> None: # type: ignore
+		""" Add a snapshot taken from a histogram with the same buckets """
+		counts, total = snapshot
+		state = self.__state(labels)
+		for i, count in enumerate(counts):
+			state[0][i] += count
+		state[1] += total
+
+
+	def samples(self) -> "list": # type: ignore
+		samples = []
+		for key, (counts, total) in self.values.items():
+			cumulative = 0
+			for bound, count in zip(self.buckets + (math.inf,), counts):
+				cumulative += count
+				samples.append((self.name + "_bucket", formatLabels(self.labels, key, f'le="{formatValue(bound)}"'), cumulative))
+			samples.append((self.name + "_sum", formatLabels(self.labels, key), total))
+			samples.append((self.name + "_count", formatLabels(self.labels, key), cumulative))
+		return samples
+
+
+	def __state(self, labels: dict) -> list:
+		key = tuple(labels[name] for name in self.labels)
+		state = self.values.get(key)
+		if state is None:
+			state = self.values[key] = [[0] * (len(self.buckets) + 1), 0.0]
+		return state
+
+
+class Registry():
+
+	def __init__(self):
+		self.metrics = []
+
+
+	def register(self, metric):
+		""" Add a metric to the exposition and return it """
+		self.metrics.append(metric)
+		return metric
+
+
+	def render(self) -> str:
+		""" Every registered metric in the Prometheus text format """
+		lines = []
+		for metric in self.metrics:
+			lines.append(f"# HELP {metric.name} {metric.help}")
+			lines.append(f"# TYPE {metric.name} {metric.type}")
+			for name, labels, value in metric.samples():
+				lines.append(f"{name}{labels} {formatValue(value)}")
+		return "\n".join(lines) + "\n"
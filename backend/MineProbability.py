@@ -0,0 +1,66 @@
+# DESCRIPTION:	This file turns the per-component solution counts produced by
+#				MyAI.forward_checking into exact mine probabilities for every
+#				covered tile. Components are independent except for the
+#				global number of mines left, so the counts of all components
+#				are combined by convolving their mine-total distributions and
+#				weighting every frontier total by the number of ways the
+#				remaining mines fit into the unconstrained interior tiles.
+
+from math import comb
+
+
+def convolve(a: dict, b: dict) -> dict:
+	""" Combine two {mines: ways} distributions of independent tile groups """
+	result = {}
+	for mines_a, ways_a in a.items():
+		for mines_b, ways_b in b.items():
+			result[mines_a + mines_b] = result.get(mines_a + mines_b, 0) + ways_a * ways_b
+	return result
+
+
+def mine_probabilities(components: list, interior_tiles: list, mines_remaining: int) -> dict:
+	"""
+	Return {tile: probability of a mine} for every frontier and interior tile, or None when no
+	layout is consistent with the constraints and the number of mines left. Each component needs
+	"tiles", "totals" ({mines: solutions}) and "tile_mines_by_total" ({mines: {tile: solutions}}).
+	"""
+	interior = len(interior_tiles)
+
+	def interior_ways(frontier_mines):
+		left = mines_remaining - frontier_mines
+		return comb(interior, left) if 0 <= left <= interior else 0
+
+	# prefix[i] / suffix[i] hold the mine-total distribution of components before / from i
+	prefix = [{0: 1}]
+	for component in components:
+		prefix.append(convolve(prefix[-1], component["totals"]))
+	suffix = [{0: 1}] * (len(components) + 1)
+	for i in range(len(components) - 1, -1, -1):
+		suffix[i] = convolve(components[i]["totals"], suffix[i + 1])
+
+	total_weight = 0
+	interior_mine_weight = 0
+	for frontier_mines, ways in prefix[-1].items():
+		weight = ways * interior_ways(frontier_mines)
+		total_weight += weight
+		interior_mine_weight += weight * (mines_remaining - frontier_mines)
+	if total_weight == 0:
+		return None
+
+	probabilities = {}
+	for i, component in enumerate(components):
+		others = convolve(prefix[i], suffix[i + 1])
+		tile_weight = dict.fromkeys(component["tiles"], 0)
+		for mines, tile_mines in component["tile_mines_by_total"].items():
+			weight = sum(ways * interior_ways(mines + other_mines) for other_mines, ways in others.items())
+			if weight:
+				for tile, solutions in tile_mines.items():
+					tile_weight[tile] += solutions * weight
+		for tile, weight in tile_weight.items():
+			probabilities[tile] = weight / total_weight
+
+	if interior:
+		interior_probability = interior_mine_weight / (total_weight * interior)
+		for tile in interior_tiles:
+			probabilities[tile] = interior_probability
+	return probabilities
@@ -0,0 +1,288 @@
+# DESCRIPTION:	This file contains the anytime fallback MyAI.forward_checking
+#				uses for frontier components too large to enumerate. Instead
+#				of listing every mine assignment, a Markov chain samples
+#				them: single-tile heat bath flips and Metropolis swaps of a
+#				mine with a free tile, on a target that
+#				penalises every mine a constraint is off by, so the chain
+#				can walk through invalid assignments, and only the valid
+#				states it visits are counted. All valid assignments have the
+#				same weight under that target, so the counts estimate the
+#				same "totals" and "tile_mines_by_total" enumeration gives,
+#				up to a common factor that MineProbability cancels out.
+#
+#				The chain is tilted towards the mine totals the interior
+#				favours: an assignment with k mines also weighs as many as
+#				the ways the mines left over fit into the interior. Every
+#				counted state is divided by that weight again, so the
+#				estimate stays the same while the likely totals get most
+#				of the samples.
+#
+# NOTES:		- One chain runs for the whole time budget, which is split
+#				  into BATCHES consecutive stretches. Each stretch's counts
+#				  are kept as a batch, and the spread of the probabilities
+#				  computed from each batch alone gives the confidence
+#				  intervals.
+#				- Every valid state the chain visits after burn-in is
+#				  counted, a state the chain stays in once per visit. Those
+#				  visits are strongly correlated, so how far an estimate can
+#				  be trusted is its effective sample size, taken from the
+#				  spread of the batches and capped by the number of distinct
+#				  valid states visited.
+#				- A chain still short of half the wanted effective samples
+#				  halfway through its budget stops there, leaving the rest
+#				  of the budget to the caller.
+#				- A component the chain found no valid assignment for in
+#				  time comes back with no solutions.
+
+import math
+import time
+
+from MineProbability import mine_probabilities
+
+
+BATCHES = 8
+# Student t quantiles for a two-sided 95% interval, by degrees of freedom (batches - 1)
+T_QUANTILES = {1: 12.706, 2: 4.303, 3: 3.182, 4: 2.776, 5: 2.571, 6: 2.447, 7: 2.365}
+# Inverse temperature of the chain: each mine a constraint is off by divides the weight by e^BETA
+BETA = 2.0
+# Sweeps a chain runs before it starts counting
+BURN_IN_SWEEPS = 10
+
+
+def empty_counts(tiles: list) -> dict:
+	return {"tiles": set(tiles), "solutions": 0, "states": 0, "totals": {}, "tile_mines_by_total": {}}
+
+
+def log_interior_ways(tiles: int, interior: int, mines_remaining: int) -> list:
+	""" log C(interior, mines_remaining - k) for k = 0..tiles mines in the component, -inf where impossible """
+	ways = []
+	for k in range(tiles + 1):
+		left = mines_remaining - k
+		if 0 <= left <= interior:
+			ways.append(math.lgamma(interior + 1) - math.lgamma(left + 1) - math.lgamma(interior - left + 1))
+		else:
+			ways.append(-math.inf)
+	return ways
+
+
+def run_chain(tiles: list, cells: list, graph: "ConstraintGraph", tilt: list, deadlines: list, rng: "random.Random") -> "Iterator": # type: ignore
+	"""
+	Sample the assignments of one component with a single chain, yielding the counts of every interval
+	between deadlines as one batch, weighted back by 1 / e^tilt[k], as soon as the interval is over
+	"""
+	cell_index = {cell: c for c, cell in enumerate(cells)}
+	required = [graph.cellMines[cell] for cell in cells]
+	tile_cells = [[cell_index[cell] for cell in graph.tileCells[tile]] for tile in tiles]
+	index = {tile: i for i, tile in enumerate(tiles)}
+	# Tiles sharing a constraint with each tile, the partners of swaps
+	partners = [sorted({index[other] for cell in graph.tileCells[tile] for other in graph.cellTiles[cell]} - {i})
+				for i, tile in enumerate(tiles)]
+	# Start from a random assignment with the total the interior favours most, so the chain never starts
+	# stuck among totals the interior cannot make up
+	start_total = max(range(len(tilt)), key=lambda k: tilt[k])
+	state = [False] * len(tiles)
+	for i in rng.sample(range(len(tiles)), start_total):
+		state[i] = True
+	cell_mines = [0] * len(cells)
+	for i, is_mine in enumerate(state):
+		if is_mine:
+			for c in tile_cells[i]:
+				cell_mines[c] += 1
+	violation = sum(abs(mines - need) for mines, need in zip(cell_mines, required))
+	total = start_total
+	# Counted states are weighted relative to the most likely total, to keep the weights in range
+	reference = tilt[start_total]
+
+	counts = empty_counts(tiles)
+	# Weight and visits of the current state not added to counts yet. Most moves are rejected, so a state
+	# is only written out once the chain leaves it
+	pending = 0.0
+	visits = 0
+
+	def flush():
+		counts["solutions"] += visits
+		counts["states"] += 1
+		counts["totals"][total] = counts["totals"].get(total, 0) + pending
+		tile_mines = counts["tile_mines_by_total"].setdefault(total, {})
+		for tile, is_mine in zip(tiles, state):
+			if is_mine:
+				tile_mines[tile] = tile_mines.get(tile, 0) + pending
+
+	sweep = len(tiles)
+	step = 0
+	burn_in = BURN_IN_SWEEPS * sweep
+	deadline = 0
+	while True:
+		# The clock is only read once a sweep
+		if step % sweep == 0 and time.perf_counter() > deadlines[deadline]:
+			if visits:
+				flush()
+				pending = 0.0
+				visits = 0
+			yield counts
+			counts = empty_counts(tiles)
+			deadline += 1
+			if deadline == len(deadlines):
+				return
+		step += 1
+
+		i = rng.randrange(sweep)
+		delta = -1 if state[i] else 1
+		move = rng.random()
+		if move < 0.5:
+			# Swap with a tile holding the other value, a partner or any tile: the total stays put, which is
+			# the only way to move when the interior allows a single total. Choosing the pair is symmetric,
+			# so Metropolis acceptance keeps the target
+			if move < 0.25 and partners[i]:
+				j = partners[i][rng.randrange(len(partners[i]))]
+			else:
+				j = rng.randrange(sweep)
+			if state[j] != state[i]:
+				moved = dict.fromkeys(tile_cells[i], 0)
+				for c in tile_cells[i]:
+					moved[c] += delta
+				for c in tile_cells[j]:
+					moved[c] = moved.get(c, 0) - delta
+				change = 0
+				for c, shift in moved.items():
+					off = cell_mines[c] - required[c]
+					change += abs(off + shift) - abs(off)
+				if change <= 0 or rng.random() < math.exp(-BETA * change):
+					if visits:
+						flush()
+						pending = 0.0
+						visits = 0
+					state[i], state[j] = state[j], state[i]
+					for c, shift in moved.items():
+						cell_mines[c] += shift
+					violation += change
+		else:
+			change = 0
+			for c in tile_cells[i]:
+				off = cell_mines[c] - required[c]
+				change += abs(off + delta) - abs(off)
+			# Heat bath: flip with probability w / (1 + w), w the weight ratio of the flipped state. A flip out
+			# of an impossible total is always taken and one into an impossible total never is
+			if tilt[total + delta] == -math.inf:
+				exponent = -BETA * change if tilt[total] == -math.inf else -math.inf
+			elif tilt[total] == -math.inf:
+				exponent = math.inf
+			else:
+				exponent = tilt[total + delta] - tilt[total] - BETA * change
+			if exponent > 30 or (exponent > -30 and rng.random() * (1 + math.exp(-exponent)) < 1):
+				if visits:
+					flush()
+					pending = 0.0
+					visits = 0
+				state[i] = not state[i]
+				for c in tile_cells[i]:
+					cell_mines[c] += delta
+				violation += change
+				total += delta
+
+		# Every valid state after burn-in is counted; the batches are consecutive stretches of the chain, so
+		# their spread accounts for how correlated neighbouring states are
+		if violation == 0 and step > burn_in and tilt[total] > -math.inf:
+			pending += math.exp(reference - tilt[total])
+			visits += 1
+
+
+def component_probabilities(counts: dict, tilt: list) -> dict:
+	""" {tile: mine probability} of a component on its own from sampled counts, None when nothing was counted """
+	top = max(tilt)
+	weights = {total: solutions * math.exp(tilt[total] - top) for total, solutions in counts["totals"].items()}
+	weight = sum(weights.values())
+	if not weight:
+		return None
+	probabilities = dict.fromkeys(counts["tiles"], 0.0)
+	for total, tile_mines in counts["tile_mines_by_total"].items():
+		scale = math.exp(tilt[total] - top) / weight
+		for tile, solutions in tile_mines.items():
+			probabilities[tile] += solutions * scale
+	return probabilities
+
+
+def effective_samples(batches: list, tilt: list) -> float:
+	"""
+	Effective sample size of a chain from its batches: the smallest p(1 - p) / variance of the mean over the
+	tiles, the variance taken from the spread of the batch estimates, and at most the distinct valid states
+	"""
+	estimates = [component_probabilities(batch, tilt) for batch in batches]
+	if len(estimates) < 2 or None in estimates:
+		return 0.0
+	effective = float(sum(batch["states"] for batch in batches))
+	for tile in estimates[0]:
+		values = [estimate[tile] for estimate in estimates]
+		mean = sum(values) / len(values)
+		variance = sum((value - mean) ** 2 for value in values) / (len(values) - 1)
+		if variance > 0:
+			effective = min(effective, mean * (1 - mean) * len(values) / variance)
+	return effective
+
+
+def sample_component(tiles: list, cells: list, graph: "ConstraintGraph", interior: int, mines_remaining: int,
+					 budget: float, rng: "random.Random", min_samples: float = 0) -> dict: # type: ignore
+	"""
+	Estimated counts of a component, in the format of enumerated ones, from a chain running for budget
+	seconds; interior is the number of covered tiles off the frontier. The chain stops halfway when it has
+	less than half of min_samples effective samples by then; "effective_samples" holds the final size
+	"""
+	tilt = log_interior_ways(len(tiles), interior, mines_remaining)
+	start = time.perf_counter()
+	batches = []
+	for batch in run_chain(tiles, cells, graph, tilt, [start + budget * (b + 1) / BATCHES for b in range(BATCHES)], rng):
+		batches.append(batch)
+		if len(batches) == BATCHES // 2 and effective_samples(batches, tilt) < min_samples / 2:
+			break
+
+	counts = empty_counts(tiles)
+	for batch in batches:
+		counts["solutions"] += batch["solutions"]
+		counts["states"] += batch["states"]
+		for total, solutions in batch["totals"].items():
+			counts["totals"][total] = counts["totals"].get(total, 0) + solutions
+		for total, tile_mines in batch["tile_mines_by_total"].items():
+			merged = counts["tile_mines_by_total"].setdefault(total, {})
+			for tile, solutions in tile_mines.items():
+				merged[tile] = merged.get(tile, 0) + solutions
+	counts["tile_mines"] = dict.fromkeys(tiles, 0)
+	for tile_mines in counts["tile_mines_by_total"].values():
+		for tile, solutions in tile_mines.items():
+			counts["tile_mines"][tile] += solutions
+	counts["complete"] = False
+	counts["batches"] = batches
+	counts["effective_samples"] = effective_samples(batches, tilt)
+	return counts
+
+
+def probability_intervals(components: list, interior_tiles: list, mines_remaining: int) -> dict:
+	"""
+	Return {tile: (low, high)}, 95% confidence intervals of the mine probabilities of mine_probabilities
+	for components with sampled counts. Every batch stands in for its component in turn; tiles of
+	enumerated components get an interval too, as sampling elsewhere moves their probabilities.
+	"""
+	sampled = [i for i, component in enumerate(components) if "batches" in component]
+	if not sampled:
+		return {}
+
+	estimates = []
+	for b in range(min(len(components[i]["batches"]) for i in sampled)):
+		if any(not components[i]["batches"][b]["solutions"] for i in sampled):
+			continue
+		batch_components = list(components)
+		for i in sampled:
+			batch_components[i] = components[i]["batches"][b]
+		probabilities = mine_probabilities(batch_components, interior_tiles, mines_remaining)
+		if probabilities:
+			estimates.append(probabilities)
+	if len(estimates) < 2:
+		return {}
+
+	intervals = {}
+	for tile in estimates[0]:
+		values = [estimate[tile] for estimate in estimates]
+		mean = sum(values) / len(values)
+		deviation = math.sqrt(sum((value - mean) ** 2 for value in values) / (len(values) - 1))
+		half = T_QUANTILES[len(values) - 1] * deviation / math.sqrt(len(values))
+		intervals[tile] = (max(0.0, mean - half), min(1.0, mean + half))
+	return intervals
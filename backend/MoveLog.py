@@ -0,0 +1,54 @@
+# DESCRIPTION:	This file contains the compact binary encoding of the move
+#				lists /api/process returns. Every move is one fixed-width
+#				little-endian record of 5 bytes instead of a JSON object:
+#
+#				x		uint16	0-indexed column
+#				y		uint16	0-indexed row
+#				kind	uint8	low 4 bits: tile number, 15 when there is
+#								none; high 4 bits: 0 reveal, 1 flag,
+#								2 exploded
+#
+#				For transport the records are base64 encoded. The frontend
+#				decoder in lib/move-log.ts reads the same layout.
+
+import base64
+import struct
+
+
+RECORD = struct.Struct("<HHB")
+MOVE_TYPES = ["reveal", "flag", "exploded"]
+NO_RESULT = 15
+
+
+def encodeMoves(moves: list) -> bytes:
+	""" Pack a list of {x, y, type, result} moves into fixed-width records """
+	data = bytearray(RECORD.size * len(moves))
+	for i, move in enumerate(moves):
+		result = move.get("result", "")
+		number = NO_RESULT if result == "" or result is None else int(result)
+		RECORD.pack_into(data, i * RECORD.size, move["x"], move["y"], MOVE_TYPES.index(move["type"]) << 4 | number)
+	return bytes(data)
+
+
+def decodeMoves(data: bytes) -> list:
+	""" Unpack records written by encodeMoves back into {x, y, type, result} moves """
+	moves = []
+	for x, y, kind in RECORD.iter_unpack(data):
+		number = kind & 0x0F
+		moves.append({
+			"x": x,
+			"y": y,
+			"type": MOVE_TYPES[kind >> 4],
+			"result": "" if number == NO_RESULT else number,
+		})
+	return moves
+
+
+def encodeMovesBase64(moves: list) -> str:
+	""" Records of encodeMoves as a base64 string, ready for JSON transport """
+	return base64.b64encode(encodeMoves(moves)).decode("ascii")
+
+
+def decodeMovesBase64(text: str) -> list:
+	""" Inverse of encodeMovesBase64 """
+	return decodeMoves(base64.b64decode(text))
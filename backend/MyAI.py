@@ -1,7 +1,20 @@
 from AI import AI
 from Action import Action
+from MineProbability import mine_probabilities
+from ConstraintGraph import ConstraintGraph
+from ConstraintPropagator import propagate
+from GaussianElimination import deduce
+from MonteCarlo import sample_component, probability_intervals
+import random
 import time
 
+# Frontier components with more tiles than this are sampled instead of enumerated, within a budget per move
+MONTE_CARLO_THRESHOLD = 40
+MONTE_CARLO_BUDGET_MS = 50
+# Effective samples below which an estimate is not trusted and the component is enumerated with what is left
+# of the budget instead. 100 bounds the 95% interval of every tile to about +-0.1
+MONTE_CARLO_MIN_SAMPLES = 100
+
 
 class MyAI( AI ):
 
@@ -12,22 +25,43 @@ class MyAI( AI ):
 		self.minesRemaining = totalMines
 		self.flagFrontier = set()
 		self.moreThanZeroFrontier = {}
-		self.remainingTiles = [(row, column) for row in range(colDimension) for column in range(rowDimension)]
-		self.zerosFrontier = []
+		# Covered tiles and queued safe tiles are dicts used as insertion-ordered sets: membership and
+		# removal are O(1) and popitem() returns tiles in the same order list.pop() used to
+		self.remainingTiles = dict.fromkeys((row, column) for row in range(colDimension) for column in range(rowDimension))
+		self.zerosFrontier = {}
 		self.lastMove = (startX, startY)
 		self.coveredNeighborsReduction = {}
+		# Frontier constraints kept up to date on every uncover and flag, and the enumeration results of
+		# components that have not changed since forward_checking last ran
+		self.constraintGraph = ConstraintGraph()
+		self.componentCounts = {}
+		# Components whose search hit the forward_checking time limit, their probabilities are estimates
+		self.searchTimeouts = 0
+		# Sampling of oversized components, and the 95% intervals of the probabilities of the last guess
+		# that used it, tile -> (low, high)
+		self.monteCarloThreshold = MONTE_CARLO_THRESHOLD
+		self.monteCarloBudgetMs = MONTE_CARLO_BUDGET_MS
+		self.monteCarloMinSamples = MONTE_CARLO_MIN_SAMPLES
+		# Components sampled so far; their probabilities depend on timing, so games that sampled are not repeatable
+		self.sampledComponents = 0
+		# Whether forward_checking last left a component out, its tiles then count as interior tiles
+		self.componentLeftOut = False
+		self.random = random.Random(0)
+		self.probabilityIntervals = {}
+		# Tracing.Tracer recording the phases of every call, None when the agent is not traced
+		self.tracer = None
 
 		# Create board to record moves and results
 		self.board = [['x'] * rowDimension for _ in range(colDimension)]
 		self.board[startX][startY] = 0
-		self.remainingTiles.remove((startX, startY))
+		del self.remainingTiles[(startX, startY)]
 
 					
 	def addNeighborsToFrontier(self, row, column):
 		neighbors = self.getCoveredNeighbors(row, column)
 		for neighbor in neighbors:
 			if neighbor not in self.zerosFrontier:
-				self.zerosFrontier.append(neighbor)
+				self.zerosFrontier[neighbor] = None
 
 	def getCoveredNeighbors(self, row, column):
 		neighbors = set()
@@ -46,27 +80,6 @@ class MyAI( AI ):
 		neighbors.remove((row, column))
 		return neighbors
 
-	def getHalfUncoveredNeighbors(self, row, column):
-		neighbors = set()
-		for x in range(max(0, row-1), min(self.rowCount, row+2)): 
-			for y in range(column, min(self.columnCount, column+2)):
-				if (x, y) not in self.remainingTiles:
-					neighbors.add((x, y))
-		neighbors.remove((row, column))
-		if row-1 >= 0 and (row-1, column) in neighbors:
-			neighbors.remove((row-1, column))
-		return neighbors
-
-	def getMoreThanZeroNeighbors(self, row, column):
-		neighbors = {}
-		for x in range(max(0, row-1), min(self.rowCount, row+2)): 
-			for y in range(max(0, column-1), min(self.columnCount, column+2)):
-				if (x, y) in self.moreThanZeroFrontier.keys():
-					neighbors[(x, y)] = self.moreThanZeroFrontier[(x, y)]
-		if (row, column) in neighbors:
-			neighbors.pop((row, column))
-		return neighbors
-
 	def updateFlagNeighbors(self, row, column):
 		neighbors = self.getUncoveredNeighbors(row, column)
 		for neighbor in neighbors:
@@ -84,301 +97,345 @@ class MyAI( AI ):
 			else:
 				self.coveredNeighborsReduction[neighbor] = 1
 		
-	def addFlagsToFlagFrontier(self, row, column, number):
-		if number == 1:
-			if row-1 >= 0 and column - 1 >= 0 and row+1 < self.rowCount and column+1 < self.columnCount:
-				if self.board[row-1][column] == 0:
-					if self.board[row][column-1] == 0:
-						if (row+1, column+1) not in self.flagFrontier: # Might be removable
-							self.flagFrontier.add((row+1, column+1))
-					elif self.board[row][column+1] == 0:
-						if (row+1, column-1) not in self.flagFrontier:
-							self.flagFrontier.add((row+1, column-1))
-				elif self.board[row+1][column] == 0:
-					if self.board[row][column+1] == 0:
-						if (row-1, column-1) not in self.flagFrontier:
-							self.flagFrontier.add((row-1, column-1))
-					elif  self.board[row][column-1] == 0:
-						if (row-1, column+1) not in self.flagFrontier:
-							self.flagFrontier.add((row-1, column+1))
-		
-		possible_flags = self.getCoveredNeighbors(row, column)
-		if len(possible_flags) == number:
-			for flag in possible_flags:
-				if flag not in self.flagFrontier:
-					self.flagFrontier.add(flag)
-
-    
-	def forward_checking(self, time_limit=20):
-		start_time = time.time()
+	def uncover(self, tile):
+		del self.remainingTiles[tile]
+		self.constraintGraph.removeTile(tile, False)
+		self.moveCount += 1
+		self.lastMove = tile
+		return Action(AI.Action.UNCOVER, tile[0], tile[1])
+
+	def addConstraint(self, cell, number):
+		# The graph only holds undecided tiles, so tiles already queued to be uncovered or flagged are left
+		# out and queued mines are taken off the count
+		tiles = set()
+		for tile in self.getCoveredNeighbors(cell[0], cell[1]):
+			if tile in self.flagFrontier:
+				number -= 1
+			elif tile not in self.zerosFrontier:
+				tiles.add(tile)
+		self.constraintGraph.addConstraint(cell, tiles, number)
+
+	def queueDeductions(self, safe, mines):
+		self.flagFrontier.update(mines)
+		for tile in safe:
+			if tile not in self.zerosFrontier:
+				self.zerosFrontier[tile] = None
+
+	def forward_checking(self, time_limit=20, collect_combinations=False):
+		# Enumerate the mine assignments of every connected frontier, where tiles are connected when they share
+		# a numbered neighbour. Only aggregate counts are kept per component unless collect_combinations is set:
+		# solutions, solutions per mine total and, for each total, how many solutions mine each tile.
+		# A component whose search hits the time limit is marked incomplete and its counts are a lower bound.
+		start_time = time.perf_counter()
 		all_possible_combinations = set()
-
-		covered_neighbors_cache = {}
-		more_than_zero_neighbors_cache = {}
-
-		def get_cached_covered_neighbors(row, col):
-			if (row, col) not in covered_neighbors_cache:
-				covered_neighbors_cache[(row, col)] = self.getCoveredNeighbors(row, col)
-			return covered_neighbors_cache[(row, col)]
-
-		def get_cached_more_than_zero_neighbors(row, col):
-			if (row, col) not in more_than_zero_neighbors_cache:
-				more_than_zero_neighbors_cache[(row, col)] = self.getMoreThanZeroNeighbors(row, col)
-			return more_than_zero_neighbors_cache[(row, col)]
-
-		def is_complete_combination_valid(comb):
-			for (row, col), required_mines in self.moreThanZeroFrontier.items():
-				covered_neighbors = get_cached_covered_neighbors(row, col)
-				mine_count = sum((r, c) in comb for r, c in covered_neighbors)
-				if mine_count != required_mines:
-					return False
-			return True
-
-		partial_valid_cache = {}
-
-		def is_partial_combination_valid(current_comb, recent_tile, remaining_tiles):
-			if recent_tile in partial_valid_cache:
-				return partial_valid_cache[recent_tile]
-
-			row, col = recent_tile
-			for (r, c), required_mines in get_cached_more_than_zero_neighbors(row, col).items():
-				covered_neighbors = get_cached_covered_neighbors(r, c)
-				if (row, col) in covered_neighbors:
-					mine_count = sum((nr, nc) in current_comb for nr, nc in covered_neighbors)
-					remaining_covered_neighbors = len([tile for tile in covered_neighbors if (tile not in current_comb and tile in remaining_tiles)])
-					if mine_count > required_mines or mine_count + remaining_covered_neighbors < required_mines:
-						partial_valid_cache[recent_tile] = False
-						return False
-			partial_valid_cache[recent_tile] = True
-			return True
-
-		def generate_combinations(current_comb, remaining_tiles):
-			if time.time() - start_time > time_limit:
-				return
-			if not remaining_tiles:
-				if is_complete_combination_valid(current_comb):
+		components = []
+
+		graph = self.constraintGraph
+		constraints = {cell: (tiles, graph.cellMines[cell]) for cell, tiles in graph.cellTiles.items()}
+
+		def search_order(tiles):
+			# BFS order keeps tiles of the same constraint close together so the search prunes early
+			members = set(tiles)
+			order = [tiles[0]]
+			visited = {tiles[0]}
+			for tile in order:
+				for cell in graph.tileCells[tile]:
+					for neighbor in graph.cellTiles[cell]:
+						if neighbor in members and neighbor not in visited:
+							visited.add(neighbor)
+							order.append(neighbor)
+			return order
+
+		def enumerate_frontier(tiles, cells, counts, deadline):
+			required = [constraints[cell][1] for cell in cells]
+			unassigned = [len(constraints[cell][0]) for cell in cells]
+			mines = [0] * len(cells)
+			tile_constraints = {tile: [] for tile in tiles}
+			for j, cell in enumerate(cells):
+				for tile in constraints[cell][0]:
+					tile_constraints[tile].append(j)
+			tile_constraints = [tile_constraints[tile] for tile in tiles]
+			current_comb = []
+			nodes = [0]
+
+			def record_combination():
+				if collect_combinations:
 					all_possible_combinations.add(frozenset(current_comb))
-				return
-
-			tile = next(iter(remaining_tiles))
-
-			if is_partial_combination_valid(current_comb, tile, remaining_tiles):
-				generate_combinations(current_comb, remaining_tiles - {tile})
-
-				current_comb.add(tile)
-				if is_partial_combination_valid(current_comb, tile, remaining_tiles - {tile}):
-					generate_combinations(current_comb, remaining_tiles - {tile})
-				current_comb.remove(tile)
-
-		def find_connected_frontiers(frontier_tiles):
-			frontiers = []
-			visited = set()
-
-			def bfs(start_tile):
-				queue = [start_tile]
-				connected_component = set()
-				while queue:
-					current = queue.pop(0)
-					if current not in visited:
-						visited.add(current)
-						connected_component.add(current)
-						neighbors = get_cached_covered_neighbors(*current)
-						for neighbor in neighbors:
-							if neighbor in frontier_tiles and neighbor not in visited:
-								queue.append(neighbor)
-				return connected_component
-
-			for tile in frontier_tiles:
-				if tile not in visited:
-					frontiers.append(bfs(tile))
-			
-			return frontiers
+					return
+				total = len(current_comb)
+				counts["solutions"] += 1
+				counts["totals"][total] = counts["totals"].get(total, 0) + 1
+				tile_mines = counts["tile_mines_by_total"].setdefault(total, {})
+				for tile in current_comb:
+					tile_mines[tile] = tile_mines.get(tile, 0) + 1
+
+			def generate_combinations(i):
+				if i == len(tiles):
+					record_combination()
+					return True
+				nodes[0] += 1
+				if nodes[0] % 1024 == 0 and time.perf_counter() > deadline:
+					counts["complete"] = False
+					return False
 
+				for is_mine in (0, 1):
+					valid = True
+					for j in tile_constraints[i]:
+						unassigned[j] -= 1
+						mines[j] += is_mine
+						if mines[j] > required[j] or mines[j] + unassigned[j] < required[j]:
+							valid = False
+					finished = True
+					if valid:
+						if is_mine:
+							current_comb.append(tiles[i])
+						finished = generate_combinations(i + 1)
+						if is_mine:
+							current_comb.pop()
+					for j in tile_constraints[i]:
+						unassigned[j] += 1
+						mines[j] -= is_mine
+					if not finished:
+						return False
+				return True
+
+			generate_combinations(0)
+			if self.tracer is not None:
+				self.tracer.count("nodes", nodes[0])
+
+		component_counts = {}
+		self.componentLeftOut = False
+		frontier = graph.components()
+		# Sizes are checked up front so the sampling budget of the move is shared by every oversized component
+		oversized = sum(len(tiles) > self.monteCarloThreshold for tiles, _ in frontier)
+		for tiles, cells in frontier:
+			# A component with the same tiles and mine counts as last time has the same solutions
+			key = (frozenset(tiles), frozenset((cell, graph.cellMines[cell]) for cell in cells))
+			if key in self.componentCounts and not collect_combinations:
+				component_counts[key] = self.componentCounts[key]
+				components.append(component_counts[key])
+				continue
+
+			deadline = start_time + time_limit
+			if len(tiles) > self.monteCarloThreshold and not collect_combinations:
+				interior = len(self.remainingTiles) - len(graph.tileCells)
+				budget = self.monteCarloBudgetMs / 1e3 / oversized
+				sampling_start = time.perf_counter()
+				counts = sample_component(tiles, cells, graph, interior, self.minesRemaining, budget, self.random,
+										  self.monteCarloMinSamples)
+				self.sampledComponents += 1
+				if self.tracer is not None:
+					self.tracer.count("samples", counts["solutions"])
+				if counts["effective_samples"] >= self.monteCarloMinSamples:
+					components.append(counts)
+					continue
+				# Too few effective samples to trust: enumerate with what is left of the budget instead, which
+				# gives lower bounds rather than estimates but still a probabilistic guess
+				sampled = counts
+				deadline = sampling_start + budget
+
+			counts = {"tiles": set(tiles), "solutions": 0, "totals": {}, "tile_mines_by_total": {}, "complete": True}
+			enumerate_frontier(search_order(tiles), cells, counts, deadline)
+			counts["tile_mines"] = dict.fromkeys(tiles, 0)
+			for tile_mines in counts["tile_mines_by_total"].values():
+				for tile, solutions in tile_mines.items():
+					counts["tile_mines"][tile] += solutions
+			if counts["complete"]:
+				component_counts[key] = counts
+			else:
+				self.searchTimeouts += 1
+			if not counts["solutions"] and len(tiles) > self.monteCarloThreshold and not collect_combinations:
+				# Neither sampling nor enumeration found an assignment in time. The few samples are better than
+				# nothing; without any, the component is left out and its tiles count as interior tiles
+				counts = sampled
+				if not counts["solutions"]:
+					self.componentLeftOut = True
+					continue
+			components.append(counts)
+		self.componentCounts = component_counts
+		if self.tracer is not None:
+			self.tracer.count("components", len(components))
+
+		if collect_combinations:
+			return all_possible_combinations
+		return components
+
+	def make_probabilistic_guess(self, components):
 		frontier_tiles = set()
-		for (row, col) in self.moreThanZeroFrontier.keys():
-			frontier_tiles.update(get_cached_covered_neighbors(row, col))
-
-		connected_frontiers = find_connected_frontiers(frontier_tiles)
-
-		for frontier in connected_frontiers:
-			generate_combinations(set(), frontier)
-
-		return all_possible_combinations
-
-	def make_probabilistic_guess(self, possible_combinations):
-		tile_probabilities = {}
-
-		covered_neighbors_set = set()
-		for (row, col) in self.moreThanZeroFrontier.keys():
-			covered_neighbors_set.update(self.getCoveredNeighbors(row, col))
-
-		for tile in covered_neighbors_set:
-			tile_probabilities[tile] = 0
+		for component in components:
+			frontier_tiles.update(component["tiles"])
+		interior_tiles = [tile for tile in self.remainingTiles if tile not in frontier_tiles]
 
-		for comb in possible_combinations:
-			for tile in comb:
-				tile_probabilities[tile] += 1
-
-		if not tile_probabilities:
+		probabilities = mine_probabilities(components, interior_tiles, self.minesRemaining)
+		if not probabilities:
 			return None, None
+		self.probabilityIntervals = probability_intervals(components, interior_tiles, self.minesRemaining)
+
+		# Probabilities are exact when every component was fully enumerated, so 0 and 1 are certainties:
+		# queue all of them and hand back one. Otherwise uncover the safest tile, preferring the frontier on ties
+		if all(component["complete"] for component in components) and not self.componentLeftOut:
+			for tile, probability in probabilities.items():
+				if probability == 0 and tile not in self.zerosFrontier:
+					self.zerosFrontier[tile] = None
+				elif probability == 1:
+					self.flagFrontier.add(tile)
+			if self.zerosFrontier:
+				return self.zerosFrontier.popitem()[0], None
+			if self.flagFrontier:
+				return None, next(iter(self.flagFrontier))
+
+		safest_tile = min(probabilities, key=lambda tile: (probabilities[tile], tile not in frontier_tiles))
+		return safest_tile, None
+
+
+	def flag_from_frontier(self):
+		flag = self.flagFrontier.pop()
+		self.lastMove = flag
+		self.minesRemaining -= 1
+		del self.remainingTiles[flag]
+		# Mark the flag right away, a batch can place the next flag next to it before any percept comes back
+		self.board[flag[0]][flag[1]] = -1
+		self.constraintGraph.removeTile(flag, True)
+		self.updateFlagNeighbors(flag[0], flag[1])
+		self.moveCount += 1
+		return Action(AI.Action.FLAG, flag[0], flag[1])
+
+	def recordPercept(self, tile, number):
+		if number >= 0 and tile in self.coveredNeighborsReduction:
+			number -= self.coveredNeighborsReduction.pop(tile)
+		if number == 0:
+			self.addNeighborsToFrontier(tile[0], tile[1])
+		elif number > 0:
+			self.moreThanZeroFrontier[tile] = number
+			self.addConstraint(tile, number)
 
-		total_combinations = len(possible_combinations)
-
-		min_tile = None
-		max_tile = None
-		min_prob = float('inf')
-		max_prob = float('-inf')
-
-		for tile, prob in tile_probabilities.items():
-			if prob < min_prob:
-				min_prob = prob
-				min_tile = tile
-			if prob > max_prob:
-				max_prob = prob
-				max_tile = tile
-
-		min_probability_stat = (total_combinations - min_prob) / total_combinations
-		max_probability_stat = max_prob / total_combinations
-
-		outside_frontier_covered_tiles = set(self.remainingTiles) - tile_probabilities.keys()
-
-		if outside_frontier_covered_tiles:
-			frontier_mine_count = (max_prob + min_prob) // 2
-			outside_mine_count = self.minesRemaining - frontier_mine_count
-			outside_covered_tiles_count = len(outside_frontier_covered_tiles)
-
-			if outside_covered_tiles_count > 0:
-				outside_safe_probability = 1 - (outside_mine_count / outside_covered_tiles_count)
-				total_remaining_tiles = len(self.remainingTiles)
-				frontier_density = len(tile_probabilities) / total_remaining_tiles
-
-				# heuristic threshold for risk/reward utilization ratio
-				if (outside_safe_probability > min_probability_stat and
-					(max_probability_stat < 0.75 or outside_safe_probability > max_probability_stat)):
-					return outside_frontier_covered_tiles.pop(), None
-
-
-
-		if min_prob == total_combinations:
-			self.flagFrontier.add(min_tile)
-		if max_prob == 0 or min_probability_stat / max_probability_stat > 0.7:
-			return min_tile, None
-
-		return (min_tile, None) if max_tile is None else (None, max_tile)
+		self.board[tile[0]][tile[1]] = number
 
 
 	def getAction(self, number: int) -> "Action Object": # type: ignore	
-		def flag_from_frontier():
-			flag = self.flagFrontier.pop()
-			self.lastMove = flag
-			self.minesRemaining -= 1
-			self.remainingTiles.remove(flag)
-			self.updateFlagNeighbors(flag[0], flag[1])
-			self.moveCount += 1
-			return Action(AI.Action.FLAG, flag[0], flag[1])
-		
-
 		# record previous uncover
-		if number >= 0 and self.lastMove in self.coveredNeighborsReduction:
-			number -= self.coveredNeighborsReduction.pop(self.lastMove)
-		if number == 0:
-			self.addNeighborsToFrontier(self.lastMove[0], self.lastMove[1])
-		elif number > 0:
-			self.moreThanZeroFrontier[self.lastMove] = number
-
-		self.board[self.lastMove[0]][self.lastMove[1]] = number
+		self.recordPercept(self.lastMove, number)
+		if self.tracer is not None:
+			self.tracer.mark("zeros")
 		
 		# Uncover all safe tiles
 		while self.zerosFrontier:
-			tile = self.zerosFrontier.pop()
-			self.remainingTiles.remove(tile)
-			self.moveCount += 1
-			self.lastMove = tile
-			return Action(AI.Action.UNCOVER, tile[0], tile[1])
+			return self.uncover(self.zerosFrontier.popitem()[0])
 		
 		# Uncover all tiles when no mines are left
+		if self.tracer is not None:
+			self.tracer.mark("all_clear")
 		while self.minesRemaining == 0:
 			while self.remainingTiles:
-				tile = self.remainingTiles.pop()
+				tile = self.remainingTiles.popitem()[0]
+				self.constraintGraph.removeTile(tile, False)
 				self.lastMove = tile
 				self.board[self.lastMove[0]][self.lastMove[1]] = number
 				return Action(AI.Action.UNCOVER, tile[0], tile[1])
 			return Action(AI.Action.LEAVE)
 
-		# Find mines and flag them
-		for key, num in self.moreThanZeroFrontier.items():
-			if not self.flagFrontier:
-				self.addFlagsToFlagFrontier(key[0], key[1], num)
-			else:
-				break
+		# Deterministic deductions: propagate the changed constraints to a fixed point
+		if self.tracer is not None:
+			self.tracer.mark("propagate")
+		self.queueDeductions(*propagate(self.constraintGraph))
 		while self.flagFrontier:
-		
-			return flag_from_frontier()
-		else:
-			sorted_data = sorted(self.moreThanZeroFrontier.items(), key=lambda item: item[0])
-			inverted_index = {}
-			for data in sorted_data:
-				b = [value for value in sorted_data if value[0] in self.getHalfUncoveredNeighbors(data[0][0], data[0][1])]
-				if b:
-					inverted_index[data] = b
-			for a in inverted_index:
-				for b in inverted_index[a]:
-					a_neighbors = self.getCoveredNeighbors(a[0][0], a[0][1])
-					b_neighbors = self.getCoveredNeighbors(b[0][0], b[0][1])
-					a_not_b = [neighbor for neighbor in a_neighbors if neighbor not in b_neighbors]
-					b_not_a = [neighbor for neighbor in b_neighbors if neighbor not in a_neighbors]
-					if a[1] - b[1] == len(a_not_b):
-						for tile in a_not_b:
-							if tile in self.remainingTiles:
-								if tile not in self.flagFrontier:
-									self.flagFrontier.add(tile)
-						for tile in b_not_a:
-							if tile in self.remainingTiles:
-								if tile not in self.zerosFrontier:
-									self.zerosFrontier.append(tile)
-									if tile in self.moreThanZeroFrontier:
-										self.moreThanZeroFrontier.pop(tile)
-					elif b[1] - a[1] == len(b_not_a):
-						for tile in b_not_a:
-							if tile in self.remainingTiles:
-								if tile not in self.flagFrontier:
-									self.flagFrontier.add(tile)
-						for tile in a_not_b:
-							if tile in self.remainingTiles:
-								if tile not in self.zerosFrontier:
-									self.zerosFrontier.append(tile)
-									if tile in self.moreThanZeroFrontier:
-										self.moreThanZeroFrontier.pop(tile)
-
-					while self.flagFrontier:
-						return flag_from_frontier()
-					while self.zerosFrontier:
-						tile = self.zerosFrontier.pop()
-						self.remainingTiles.remove(tile)
-						self.moveCount += 1
-						self.lastMove = tile
-						return Action(AI.Action.UNCOVER, tile[0], tile[1])
-
-
-            # Forward Checking
-
-			possible_combinations = self.forward_checking(20)
-			if possible_combinations:
-				most_likely_safe, most_likely_mine = self.make_probabilistic_guess(possible_combinations)
-				if most_likely_safe:
-					self.remainingTiles.remove(most_likely_safe)
-					self.moveCount += 1
-					self.lastMove = most_likely_safe
-					return Action(AI.Action.UNCOVER, most_likely_safe[0], most_likely_safe[1])
-				elif most_likely_mine:
-					if most_likely_mine not in self.flagFrontier:
-						self.flagFrontier.add(most_likely_mine)
-					return flag_from_frontier()
-
-
-			# Guess
-
-			tile = self.remainingTiles.pop()
-			self.moveCount += 1
-			self.lastMove = tile
-			return Action(AI.Action.UNCOVER, tile[0], tile[1])
\ No newline at end of file
+			return self.flag_from_frontier()
+		while self.zerosFrontier:
+			return self.uncover(self.zerosFrontier.popitem()[0])
+
+		# Gaussian elimination over the frontier; once every covered tile is on the frontier the number of
+		# mines left is one more equation
+		if self.tracer is not None:
+			self.tracer.mark("gauss")
+		frontier_only = len(self.constraintGraph.tileCells) == len(self.remainingTiles)
+		self.queueDeductions(*deduce(self.constraintGraph, self.minesRemaining if frontier_only else None))
+		while self.flagFrontier:
+			return self.flag_from_frontier()
+		while self.zerosFrontier:
+			return self.uncover(self.zerosFrontier.popitem()[0])
+
+		return self.guess()
+
+
+	def getActions(self, percepts: list) -> list:
+		"""
+		Batch form of getAction: record every (x, y, number) percept of the last batch, number being -1 for
+		flags, including tiles the world opened without being asked, then return every action that is known
+		to be right, or a single guess when there is none. All flags of a batch come before its uncovers, so
+		no flag is placed next to a tile whose number has not been recorded yet.
+		"""
+		# Tiles the world opened on its own, such as a cascade from a 0, are taken off the covered set
+		# before any number is recorded, so no constraint counts them as covered
+		for x, y, number in percepts:
+			if number >= 0 and (x, y) in self.remainingTiles:
+				del self.remainingTiles[(x, y)]
+				self.zerosFrontier.pop((x, y), None)
+				self.constraintGraph.removeTile((x, y), False)
+		for x, y, number in percepts:
+			self.recordPercept((x, y), number)
+
+		def drain_frontiers():
+			actions = []
+			while self.flagFrontier:
+				actions.append(self.flag_from_frontier())
+			while self.zerosFrontier:
+				actions.append(self.uncover(self.zerosFrontier.popitem()[0]))
+			return actions
+
+		if self.tracer is not None:
+			self.tracer.mark("zeros")
+		actions = drain_frontiers()
+		if actions:
+			return actions
+
+		# Uncover all tiles when no mines are left
+		if self.tracer is not None:
+			self.tracer.mark("all_clear")
+		if self.minesRemaining == 0:
+			while self.remainingTiles:
+				actions.append(self.uncover(next(reversed(self.remainingTiles))))
+			actions.append(Action(AI.Action.LEAVE))
+			return actions
+
+		if self.tracer is not None:
+			self.tracer.mark("propagate")
+		self.queueDeductions(*propagate(self.constraintGraph))
+		actions = drain_frontiers()
+		if actions:
+			return actions
+
+		if self.tracer is not None:
+			self.tracer.mark("gauss")
+		frontier_only = len(self.constraintGraph.tileCells) == len(self.remainingTiles)
+		self.queueDeductions(*deduce(self.constraintGraph, self.minesRemaining if frontier_only else None))
+		actions = drain_frontiers()
+		if actions:
+			return actions
+
+		return [self.guess()]
+
+
+	def guess(self) -> "Action Object": # type: ignore
+		# Forward Checking
+		if self.tracer is not None:
+			self.tracer.mark("forward_checking")
+
+		components = self.forward_checking(20)
+		if components:
+			if self.tracer is not None:
+				self.tracer.mark("probabilistic_guess")
+			most_likely_safe, most_likely_mine = self.make_probabilistic_guess(components)
+			if most_likely_safe:
+				return self.uncover(most_likely_safe)
+			elif most_likely_mine:
+				if most_likely_mine not in self.flagFrontier:
+					self.flagFrontier.add(most_likely_mine)
+				return self.flag_from_frontier()
+
+
+		# Guess
+		if self.tracer is not None:
+			self.tracer.mark("blind_guess")
+
+		tile = next(reversed(self.remainingTiles))
+		return self.uncover(tile)
\ No newline at end of file
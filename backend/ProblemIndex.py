@@ -0,0 +1,289 @@
+# DESCRIPTION:	This file contains the ProblemIndex class, a difficulty index
+#				over the world files in Problems/. For every board it keeps
+#				the bit-packed mine mask and a few difficulty measures:
+#
+#				bbbv			3BV, the fewest clicks that clear the board
+#				openings		connected regions of zero tiles
+#				density			mines per tile
+#				start_region	tiles opened by the start click
+#				solve_ms		last time MyAI took to play the board, once
+#								it has been played
+#
+#				/api/generate filters, sorts and samples boards with it and
+#				rebuilds their grids from the stored masks, without opening
+#				any world file.
+#
+# USAGE:		python ProblemIndex.py [--problems Problems]
+#				[--index Problems.index.json] [--solve] [--workers 0]
+#
+# NOTES:		- The index is refreshed incrementally: only files whose
+#				  mtime or size changed are read again, and entries of
+#				  deleted files are dropped.
+#				- Measures are taken on the board the API plays, a grid of
+#				  the file lines indexed [y][x] with the start at
+#				  grid[start_y][start_x], so they match what /api/process
+#				  and the UI show.
+#				- --solve plays every board that has no solve time yet.
+#				- The API refreshes the index on a background thread and
+#				  only reads it while answering requests.
+
+import argparse
+import base64
+import json
+import os
+import random
+import threading
+import time
+from multiprocessing import Pool
+
+import numpy as np
+
+from ProblemPack import readWorldFile
+
+
+INDEX_VERSION = 1
+DEFAULT_INDEX = "Problems.index.json"
+METRICS = ("bbbv", "openings", "density", "start_region", "solve_ms")
+
+
+def neighbourCounts(grid: np.ndarray) -> np.ndarray:
+	""" Number of mines around every tile """
+	rows, cols = grid.shape
+	padded = np.pad(grid, 1).astype(np.int16)
+	return sum(padded[dy:dy + rows, dx:dx + cols] for dy in range(3) for dx in range(3)) - grid
+
+
+def openingRegions(grid: np.ndarray, numbers: np.ndarray) -> np.ndarray:
+	""" Label every safe zero tile with the number of its opening, 1-based, and every other tile with 0 """
+	rows, cols = grid.shape
+	labels = np.zeros((rows, cols), dtype=np.int32)
+	zero = (numbers == 0) & (grid == 0)
+	count = 0
+	for y, x in zip(*np.nonzero(zero)):
+		if labels[y, x]:
+			continue
+		count += 1
+		labels[y, x] = count
+		stack = [(y, x)]
+		while stack:
+			cy, cx = stack.pop()
+			for ny in range(max(0, cy - 1), min(rows, cy + 2)):
+				for nx in range(max(0, cx - 1), min(cols, cx + 2)):
+					if zero[ny, nx] and not labels[ny, nx]:
+						labels[ny, nx] = count
+						stack.append((ny, nx))
+	return labels
+
+
+def boardMeasures(grid: np.ndarray, startX: int, startY: int) -> dict:
+	""" Difficulty measures of a [y][x] 0/1 grid played from grid[startY][startX] """
+	rows, cols = grid.shape
+	numbers = neighbourCounts(grid)
+	labels = openingRegions(grid, numbers)
+	openings = int(labels.max())
+
+	# Tiles an opening uncovers: its zeros and the numbers around them
+	padded = np.pad(labels > 0, 1)
+	touched = np.zeros((rows, cols), dtype=bool)
+	for dy in range(3):
+		for dx in range(3):
+			touched |= padded[dy:dy + rows, dx:dx + cols]
+	isolated = int(np.count_nonzero((grid == 0) & ~touched))
+
+	if grid[startY, startX]:
+		startRegion = 0
+	elif labels[startY, startX]:
+		region = np.pad(labels == labels[startY, startX], 1)
+		opened = np.zeros((rows, cols), dtype=bool)
+		for dy in range(3):
+			for dx in range(3):
+				opened |= region[dy:dy + rows, dx:dx + cols]
+		startRegion = int(np.count_nonzero(opened & (grid == 0)))
+	else:
+		startRegion = 1
+
+	return {
+		"bbbv": openings + isolated,
+		"openings": openings,
+		"density": round(float(grid.sum()) / (rows * cols), 4),
+		"start_region": startRegion,
+	}
+
+
+def indexWorldFile(path: str) -> dict:
+	""" Index entry of one world file, without its file stamp """
+	rows, cols, startX, startY, lines = readWorldFile(path)
+	grid = np.array(lines, dtype=np.uint8)
+	if grid.shape != (rows, cols):
+		raise ValueError("Grid of " + path + " does not match its dimensions")
+	entry = {
+		"rows": rows,
+		"cols": cols,
+		"start_x": startX,
+		"start_y": startY,
+		"mines": int(grid.sum()),
+		"mask": base64.b64encode(np.packbits(grid, axis=None, bitorder="little").tobytes()).decode("ascii"),
+		"solve_ms": None,
+	}
+	entry.update(boardMeasures(grid, startX, startY))
+	return entry
+
+
+def entryGrid(entry: dict) -> "list": # type: ignore
+	""" Rebuild the 0/1 grid of an index entry from its mask """
+	bits = np.unpackbits(np.frombuffer(base64.b64decode(entry["mask"]), dtype=np.uint8), count=entry["rows"] * entry["cols"], bitorder="little")
+	return bits.reshape(entry["rows"], entry["cols"]).tolist()
+
+
+def solveEntry(item: "tuple") -> "tuple": # type: ignore
+	""" Play an indexed board with MyAI the way /api/process does and return (name, milliseconds) """
+	from World import World
+	name, entry = item
+	grid = entryGrid(entry)
+	mines = [(x, y) for y, row in enumerate(grid) for x, cell in enumerate(row) if cell == 1]
+	world = World.from_grid(entry["rows"], entry["cols"], (entry["start_x"], entry["start_y"]), mines)
+	begin = time.perf_counter()
+	world.run()
+	return name, round((time.perf_counter() - begin) * 1e3, 3)
+
+
+class ProblemIndex():
+
+	def __init__(self, problemsDir: str = "Problems", path: str = DEFAULT_INDEX):
+		self.problemsDir = problemsDir
+		self.path = path			# JSON file the index is kept in, None keeps it in memory
+		self.boards = {}			# file name -> entry, with "mtime_ns" and "size" of the indexed file
+		self.__dirty = False
+		self.__lock = threading.RLock()		# refresh and save may run on a thread other than the readers'
+		if path is not None and os.path.exists(path):
+			with open(path, "r") as file:
+				data = json.load(file)
+			if data.get("version") == INDEX_VERSION:
+				self.boards = data["boards"]
+
+
+	def refresh(self) -> int:
+		"""
+		Index new and changed world files, forget deleted ones and save when anything changed; returns the files
+		read. The new boards replace the old ones in one step, so readers on other threads see either index whole
+		"""
+		with self.__lock:
+			boards = dict(self.boards)
+			seen = set()
+			read = 0
+			for root, _, files in os.walk(self.problemsDir):
+				for filename in files:
+					if not filename.endswith(".txt"):
+						continue
+					seen.add(filename)
+					stat = os.stat(os.path.join(root, filename))
+					entry = boards.get(filename)
+					if entry is not None and entry["mtime_ns"] == stat.st_mtime_ns and entry["size"] == stat.st_size:
+						continue
+					entry = indexWorldFile(os.path.join(root, filename))
+					entry["mtime_ns"] = stat.st_mtime_ns
+					entry["size"] = stat.st_size
+					boards[filename] = entry
+					read += 1
+					self.__dirty = True
+
+			for filename in [name for name in boards if name not in seen]:
+				del boards[filename]
+				self.__dirty = True
+			self.boards = boards
+			self.save()
+			return read
+
+
+	def matches(self, problem: dict) -> bool:
+		""" Whether a problem in the format of /api/generate is the indexed board of its name: same dimensions, start and grid """
+		entry = self.boards.get(problem.get("name"))
+		if entry is None or any(problem.get(key) != entry[key] for key in ("rows", "cols", "start_x", "start_y")):
+			return False
+		return problem.get("grid") == entryGrid(entry)
+
+
+	def recordSolve(self, name: str, seconds: float) -> None:
+		""" Remember how long MyAI took on a board; saved with the next refresh or save """
+		# Under the lock, so a save on the refresh thread cannot clear the dirty flag before this is written
+		with self.__lock:
+			entry = self.boards.get(name)
+			if entry is not None:
+				entry["solve_ms"] = round(seconds * 1e3, 3)
+				self.__dirty = True
+
+
+	def select(self, prefix: str, count: int, filters: dict = None, sort: str = None, descending: bool = False,
+			   sample: bool = False, seed: int = None) -> "list": # type: ignore
+		"""
+		(name, entry) of up to count boards starting with prefix whose measures lie within filters, a dict of
+		metric -> (minimum, maximum) with None for an open end. Boards come in file name order, sorted by the
+		sort metric, or as a random sample; boards without a value for the sort metric come last.
+		"""
+		for metric in list(filters or {}) + ([sort] if sort else []):
+			if metric not in METRICS:
+				raise ValueError("Unknown board metric: " + metric)
+
+		# A refresh on another thread swaps self.boards, so one version is read throughout
+		boards = self.boards
+		names = []
+		for name in sorted(boards):
+			if not name.startswith(prefix):
+				continue
+			entry = boards[name]
+			if all(self.__within(entry[metric], bounds) for metric, bounds in (filters or {}).items()):
+				names.append(name)
+
+		if sample:
+			names = random.Random(seed).sample(names, min(count, len(names)))
+		if sort:
+			known = [name for name in names if boards[name][sort] is not None]
+			unknown = [name for name in names if boards[name][sort] is None]
+			names = sorted(known, key=lambda name: boards[name][sort], reverse=descending) + unknown
+		return [(name, boards[name]) for name in names[:count]]
+
+
+	def save(self) -> None:
+		""" Write the index if it changed since it was loaded or last saved """
+		with self.__lock:
+			if self.path is None or not self.__dirty:
+				return
+			temporary = self.path + ".tmp"
+			with open(temporary, "w") as file:
+				json.dump({"version": INDEX_VERSION, "boards": self.boards}, file)
+			os.replace(temporary, self.path)
+			self.__dirty = False
+
+
+	@staticmethod
+	def __within(value, bounds) -> bool:
+		if value is None:
+			return False
+		minimum, maximum = bounds
+		return (minimum is None or value >= minimum) and (maximum is None or value <= maximum)
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Build or refresh the difficulty index of the Problems corpus")
+	parser.add_argument("--problems", help="Directory holding the world files", default="Problems")
+	parser.add_argument("--index", help="Path of the index file", default=DEFAULT_INDEX)
+	parser.add_argument("--solve", help="Play every board without a solve time to record one", action="store_true")
+	parser.add_argument("--workers", help="Worker processes for --solve, 0 for one per core", type=int, default=0)
+	args = parser.parse_args()
+
+	index = ProblemIndex(args.problems, args.index)
+	read = index.refresh()
+	print("Indexed " + str(len(index.boards)) + " boards, " + str(read) + " read from disk")
+
+	if args.solve:
+		pending = [(name, entry) for name, entry in index.boards.items() if entry["solve_ms"] is None]
+		workers = args.workers or os.cpu_count() or 1
+		with Pool(workers) as pool:
+			for name, milliseconds in pool.imap_unordered(solveEntry, pending, chunksize=16):
+				index.recordSolve(name, milliseconds / 1e3)
+		index.save()
+		print("Solved " + str(len(pending)) + " boards")
+
+
+if __name__ == "__main__":
+	main()
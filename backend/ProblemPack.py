@@ -0,0 +1,208 @@
+# DESCRIPTION:	This file compiles the text worlds in Problems/ into a single
+#				packed binary file and reads boards back out of it through
+#				mmap. Each board is a fixed-size index record followed by a
+#				bit-packed mine mask, so looking a board up is only offset
+#				arithmetic on the mapped file.
+#
+# NOTES:		- Run "python ProblemPack.py" from backend/ to (re)build
+#				  Problems.pack after adding or changing world files.
+#				- Boards are stored in filename order, the same order the
+#				  text loader used, so slicing a difficulty gives the same
+#				  problems whether the pack or the text files are used.
+#				- Mask bit i (LSB first) is tile (i % cols) of grid line
+#				  (i // cols), where line 0 is the first grid line of the
+#				  world file (the top row of the board).
+
+import argparse
+import bisect
+import itertools
+import mmap
+import os
+import struct
+
+
+MAGIC = b"MSPK"
+VERSION = 1
+DEFAULT_PACK = "Problems.pack"
+
+# magic, version, reserved, number of boards
+HEADER = struct.Struct("<4sHHI")
+# file name, rows, cols, startX, startY (0-indexed), mines, reserved, mask offset
+RECORD = struct.Struct("<32sHHHHHHQ")
+
+# Bits of every byte value, LSB first, used to unpack masks without per-bit shifting
+_BYTE_BITS = [tuple((value >> bit) & 1 for bit in range(8)) for value in range(256)]
+
+
+def maskSize(rows: int, cols: int) -> int:
+	""" Number of bytes needed for the mine mask of a rows x cols board """
+	return (rows * cols + 7) // 8
+
+
+def packMask(grid: "list") -> bytes: # type: ignore
+	""" Bit-pack a grid of 0/1 rows into a mine mask """
+	bits = 0
+	i = 0
+	for row in grid:
+		for cell in row:
+			if cell == 1:
+				bits |= 1 << i
+			i += 1
+	return bits.to_bytes((i + 7) // 8, "little")
+
+
+def readWorldFile(path: str) -> "tuple": # type: ignore
+	""" Parse a world file into (rows, cols, startX, startY, grid) with a 0-indexed start """
+	with open(path, "r") as file:
+		lines = file.readlines()
+	rows, cols = map(int, lines[0].split())
+	startX, startY = map(int, lines[1].split())
+	grid = [list(map(int, line.split())) for line in lines[2:2 + rows]]
+	return rows, cols, startX - 1, startY - 1, grid
+
+
+def compileProblems(problemsDir: str = "Problems", outputPath: str = DEFAULT_PACK) -> int:
+	""" Pack every world file under problemsDir into outputPath, returning the number of boards """
+	paths = {}
+	for root, _, files in os.walk(problemsDir):
+		for filename in files:
+			if filename.endswith(".txt"):
+				if filename in paths:
+					raise ValueError("Duplicate world file name: " + filename)
+				paths[filename] = os.path.join(root, filename)
+
+	names = sorted(paths)
+	records = []
+	masks = []
+	offset = HEADER.size + RECORD.size * len(names)
+	for name in names:
+		encoded = name.encode("utf-8")
+		if len(encoded) > 32:
+			raise ValueError("World file name too long to pack: " + name)
+		rows, cols, startX, startY, grid = readWorldFile(paths[name])
+		mask = packMask(grid)
+		if len(mask) != maskSize(rows, cols):
+			raise ValueError("Grid of " + name + " does not match its dimensions")
+		mines = sum(sum(1 for cell in row if cell == 1) for row in grid)
+		records.append(RECORD.pack(encoded, rows, cols, startX, startY, mines, 0, offset))
+		masks.append(mask)
+		offset += len(mask)
+
+	# Write to a temporary file first so readers never map a half-written pack
+	tempPath = outputPath + ".tmp"
+	with open(tempPath, "wb") as file:
+		file.write(HEADER.pack(MAGIC, VERSION, 0, len(names)))
+		file.write(b"".join(records))
+		file.write(b"".join(masks))
+	os.replace(tempPath, outputPath)
+	return len(names)
+
+
+def packIsCurrent(packPath: str, problemsDir: str = "Problems") -> bool:
+	""" True when the pack exists and no world file under problemsDir, nor a directory holding them, is newer """
+	try:
+		packMtime = os.path.getmtime(packPath)
+	except OSError:
+		return False
+	# A directory's mtime covers files added, removed or renamed in it, a file's its edits in place
+	for root, _, files in os.walk(problemsDir):
+		if os.path.getmtime(root) > packMtime:
+			return False
+		for filename in files:
+			if filename.endswith(".txt") and os.path.getmtime(os.path.join(root, filename)) > packMtime:
+				return False
+	return True
+
+
+class ProblemPack():
+
+	def __init__(self, path: str = DEFAULT_PACK):
+		self.__file = open(path, "rb")
+		self.__mmap = mmap.mmap(self.__file.fileno(), 0, access=mmap.ACCESS_READ)
+		self.__view = memoryview(self.__mmap)
+
+		magic, version, _, count = HEADER.unpack_from(self.__view, 0)
+		if magic != MAGIC or version != VERSION:
+			self.close()
+			raise ValueError("Not a version " + str(VERSION) + " problem pack: " + path)
+		self.__count = count
+		# Names are decoded once so difficulty lookups can bisect instead of scanning records
+		self.__names = [self.__record(i)[0].rstrip(b"\0").decode("utf-8") for i in range(count)]
+
+
+	def __len__(self) -> int:
+		return self.__count
+
+
+	def __record(self, index: int) -> "tuple": # type: ignore
+		""" Unpack the raw index record of a board """
+		if index < 0 or index >= self.__count:
+			raise IndexError("Board index out of range")
+		return RECORD.unpack_from(self.__view, HEADER.size + RECORD.size * index)
+
+
+	def find(self, prefix: str) -> range:
+		""" Indices of the boards whose file name starts with prefix, in file name order """
+		start = bisect.bisect_left(self.__names, prefix)
+		end = start
+		while end < self.__count and self.__names[end].startswith(prefix):
+			end += 1
+		return range(start, end)
+
+
+	def name(self, index: int) -> str:
+		""" File name the board was compiled from """
+		self.__record(index)
+		return self.__names[index]
+
+
+	def header(self, index: int) -> "tuple": # type: ignore
+		""" Return (rows, cols, startX, startY, mines) of a board, start is 0-indexed """
+		return self.__record(index)[1:6]
+
+
+	def mask(self, index: int) -> memoryview:
+		""" Zero-copy view of the bit-packed mine mask of a board """
+		_, rows, cols, _, _, _, _, offset = self.__record(index)
+		return self.__view[offset:offset + maskSize(rows, cols)]
+
+
+	def grid(self, index: int) -> "list": # type: ignore
+		""" Unpack a board into 0/1 rows in the same order as the world file lines """
+		rows, cols = self.header(index)[:2]
+		bits = list(itertools.chain.from_iterable(_BYTE_BITS[value] for value in self.mask(index)))
+		return [bits[line * cols:(line + 1) * cols] for line in range(rows)]
+
+
+	def mines(self, index: int) -> "list": # type: ignore
+		""" Mine coordinates of a board as 0-indexed (x, y) in World orientation """
+		rows, cols = self.header(index)[:2]
+		bits = int.from_bytes(self.mask(index), "little")
+		mines = []
+		while bits:
+			low = bits & -bits
+			i = low.bit_length() - 1
+			mines.append((i % cols, rows - 1 - i // cols))
+			bits ^= low
+		return mines
+
+
+	def close(self) -> None:
+		""" Release the mapping and the underlying file """
+		self.__view.release()
+		self.__mmap.close()
+		self.__file.close()
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Compile the Problems corpus into a packed binary file")
+	parser.add_argument("--problems", help="Directory holding the world files", default="Problems")
+	parser.add_argument("--output", help="Path of the pack to write", default=DEFAULT_PACK)
+	args = parser.parse_args()
+
+	count = compileProblems(args.problems, args.output)
+	print("Packed " + str(count) + " worlds into " + args.output)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,107 @@
+# DESCRIPTION:	This file contains the Replay class, which answers "what did
+#				the board look like after move N" for a solved problem
+#				without replaying the game from the start. It keeps
+#				keyframes of the covered and flag bitmaps every K moves,
+#				either the ones World saved during run or ones it builds
+#				itself from the move list, and applies only the moves
+#				since the nearest keyframe, so a seek costs O(K).
+#
+# NOTES:		- Boards are indexed [y][x] like the grids of /api/generate,
+#				  and moves are the 0-indexed moves of /api/process.
+#				- World keyframes are indexed [x][y] and are transposed on
+#				  load.
+
+import bisect
+
+import numpy as np
+
+
+COVERED = -1
+FLAGGED = -2
+EXPLODED = -3
+
+
+class Replay():
+
+	def __init__(self, problem: dict, moves: list, keyframes: list = None, interval: int = 64):
+		self.mines = np.asarray(problem["grid"], dtype=np.uint8)
+		self.rows, self.cols = self.mines.shape
+		self.totalMines = int(self.mines.sum())
+		self.moves = moves
+		self.interval = interval
+
+		padded = np.pad(self.mines, 1).astype(np.int16)
+		self.numbers = sum(padded[dy:dy + self.rows, dx:dx + self.cols] for dy in range(3) for dx in range(3)) - self.mines
+
+		self.__positions = []	# move numbers of the keyframes, ascending
+		self.__states = []		# (covered, flags, exploded) arrays and the number of flags before that move
+		if keyframes:
+			for keyframe in keyframes:
+				self.__positions.append(keyframe["move"])
+				flags = self.__unpack(keyframe["flags"])
+				self.__states.append((self.__unpack(keyframe["covered"]), flags, np.zeros_like(self.mines), int(np.count_nonzero(flags))))
+		else:
+			self.__buildKeyframes(problem["start_x"], problem["start_y"])
+
+
+	def __len__(self) -> int:
+		return len(self.moves)
+
+
+	def stateAt(self, index: int) -> "list": # type: ignore
+		"""
+		Board after move index, -1 for the board before the first move, as rows of tile numbers with
+		COVERED, FLAGGED and EXPLODED for tiles that show no number
+		"""
+		if index < -1 or index >= len(self.moves):
+			raise IndexError("Move index out of range")
+		count = index + 1
+		nearest = bisect.bisect_right(self.__positions, count) - 1
+		covered, flags, exploded, flagCount = self.__states[nearest]
+		covered, flags, exploded = covered.copy(), flags.copy(), exploded.copy()
+		for move in self.moves[self.__positions[nearest]:count]:
+			flagCount = self.__apply(move, covered, flags, exploded, flagCount)
+
+		board = self.numbers.copy()
+		board[covered == 1] = COVERED
+		board[flags == 1] = FLAGGED
+		board[exploded == 1] = EXPLODED
+		return board.tolist()
+
+
+	def __buildKeyframes(self, startX: int, startY: int) -> None:
+		""" Replay the moves once, saving the state before every interval-th move """
+		covered = np.ones_like(self.mines)
+		covered[startY, startX] = 0
+		flags = np.zeros_like(self.mines)
+		exploded = np.zeros_like(self.mines)
+		flagCount = 0
+		for i, move in enumerate(self.moves):
+			if i % self.interval == 0:
+				self.__positions.append(i)
+				self.__states.append((covered.copy(), flags.copy(), exploded.copy(), flagCount))
+			flagCount = self.__apply(move, covered, flags, exploded, flagCount)
+		if not self.__positions:
+			self.__positions.append(0)
+			self.__states.append((covered, flags, exploded, flagCount))
+
+
+	def __unpack(self, packed: bytes) -> np.ndarray:
+		""" World keyframe bitmap, indexed [x][y], as a [y][x] array """
+		bits = np.unpackbits(np.frombuffer(packed, dtype=np.uint8), count=self.cols * self.rows)
+		return bits.reshape(self.cols, self.rows).T.copy()
+
+
+	def __apply(self, move: dict, covered: np.ndarray, flags: np.ndarray, exploded: np.ndarray, flagCount: int) -> int:
+		""" Apply one move to the board arrays and return the number of flags after it """
+		x, y = move["x"], move["y"]
+		if move["type"] == "flag":
+			# As World.__flagTile: only covered, unflagged tiles, and never more flags than mines
+			if covered[y, x] and not flags[y, x] and flagCount < self.totalMines:
+				flags[y, x] = 1
+				flagCount += 1
+		else:
+			covered[y, x] = 0
+			if move["type"] == "exploded":
+				exploded[y, x] = 1
+		return flagCount
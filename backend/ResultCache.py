@@ -0,0 +1,185 @@
+# DESCRIPTION:	This file contains the ResultCache class, which remembers the
+#				games MyAI has already played so a board that is processed
+#				again is answered without running World.run(). MyAI is
+#				deterministic for a given board and start cell, unless it
+#				sampled a frontier component or a forward_checking search
+#				hit its time limit, so results are keyed by a hash of the dimensions, the mine mask, the
+#				start cell and the solver version, a hash of the backend
+#				sources. Entries are evicted least recently used first and
+#				can be persisted to an append-only JSON lines file.
+#
+# NOTES:		- With symmetry enabled, a board is canonicalised under the 8
+#				  rotations and reflections of the grid: the solver plays the
+#				  canonical board and its moves are mapped back through the
+#				  inverse symmetry. Equivalent boards then share one entry,
+#				  but MyAI breaks ties by board position, so the moves can
+#				  differ from a direct run of the original orientation. It
+#				  is off by default for that reason.
+#				- Games in which MyAI sampled a frontier component or a
+#				  forward_checking search hit its time limit are not stored:
+#				  both depend on timing, so the game could play differently
+#				  next time.
+
+import glob
+import hashlib
+import json
+import os
+import struct
+from collections import OrderedDict
+
+import numpy as np
+
+
+def solverVersion(directory: str = None) -> str:
+	""" Hash of every Python source of the backend, so any change to the solver invalidates the cache """
+	directory = directory or os.path.dirname(os.path.abspath(__file__))
+	digest = hashlib.sha256()
+	for path in sorted(glob.glob(os.path.join(directory, "*.py"))):
+		digest.update(os.path.basename(path).encode())
+		with open(path, "rb") as file:
+			digest.update(file.read())
+	return digest.hexdigest()[:16]
+
+
+# Every symmetry of the grid as (swap axes, flip x, flip y); flips are applied first, then the swap
+SYMMETRIES = [(swap, flipX, flipY) for swap in (False, True) for flipX in (False, True) for flipY in (False, True)]
+
+
+def transformBoard(grid: np.ndarray, start: "tuple", symmetry: "tuple") -> "tuple": # type: ignore
+	""" Apply a symmetry to a grid indexed [y, x] and its start cell """
+	swap, flipX, flipY = symmetry
+	height, width = grid.shape
+	x, y = start
+	if flipX:
+		grid, x = grid[:, ::-1], width - 1 - x
+	if flipY:
+		grid, y = grid[::-1, :], height - 1 - y
+	if swap:
+		grid, x, y = grid.T, y, x
+	return grid, (x, y)
+
+
+def inverseTransformCell(x: int, y: int, width: int, height: int, symmetry: "tuple") -> "tuple": # type: ignore
+	""" Map a cell of the transformed board back onto the original width x height board """
+	swap, flipX, flipY = symmetry
+	if swap:
+		x, y = y, x
+	if flipX:
+		x = width - 1 - x
+	if flipY:
+		y = height - 1 - y
+	return x, y
+
+
+def boardKey(grid: np.ndarray, start: "tuple", version: str) -> str: # type: ignore
+	""" Content hash of a board, its start cell and the solver version """
+	digest = hashlib.sha256(version.encode())
+	digest.update(struct.pack("<HHHH", grid.shape[0], grid.shape[1], start[0], start[1]))
+	digest.update(np.packbits(grid.astype(bool)).tobytes())
+	return digest.hexdigest()
+
+
+class ResultCache():
+
+	def __init__(self, maxEntries: int = 10000, path: str = None, symmetry: bool = False, version: str = None):
+		self.maxEntries = maxEntries
+		self.path = path			# JSON lines file entries are appended to, None keeps the cache in memory
+		self.symmetry = symmetry	# canonicalise boards under the 8 symmetries of the grid
+		self.version = version or solverVersion()
+		self.hits = 0
+		self.misses = 0
+
+		self.__entries = OrderedDict()	# key -> result in the frame of the board that was solved
+		if path is not None:
+			self.__load()
+
+
+	def __len__(self) -> int:
+		return len(self.__entries)
+
+
+	def prepare(self, problem: dict) -> "tuple": # type: ignore
+		""" Return (key, problem to solve, symmetry) for a problem of /api/generate """
+		grid = np.asarray(problem["grid"], dtype=np.uint8)
+		start = (problem["start_x"], problem["start_y"])
+		if not self.symmetry:
+			return boardKey(grid, start, self.version), problem, SYMMETRIES[0]
+
+		best = None
+		for symmetry in SYMMETRIES:
+			candidate, candidateStart = transformBoard(grid, start, symmetry)
+			key = (candidate.shape, candidateStart, np.packbits(candidate.astype(bool)).tobytes())
+			if best is None or key < best[0]:
+				best = (key, candidate, candidateStart, symmetry)
+		_, canonical, canonicalStart, symmetry = best
+		solved = {
+			"id": problem["id"],
+			"grid": canonical.tolist(),
+			"start_x": canonicalStart[0],
+			"start_y": canonicalStart[1],
+			"rows": canonical.shape[0],
+			"cols": canonical.shape[1],
+		}
+		return boardKey(canonical, canonicalStart, self.version), solved, symmetry
+
+
+	def restore(self, result: dict, problem: dict, symmetry: "tuple") -> dict: # type: ignore
+		""" Map a result of the solved board back onto the original problem """
+		if symmetry == SYMMETRIES[0]:
+			return {**result, "id": problem["id"]}
+		# Anything else recorded in the frame of the solved board, such as World keyframes, is dropped
+		result = {"moves": result["moves"], "outcome": result["outcome"]}
+		moves = []
+		for move in result["moves"]:
+			x, y = inverseTransformCell(move["x"], move["y"], problem["cols"], problem["rows"], symmetry)
+			moves.append({**move, "x": x, "y": y})
+		return {**result, "id": problem["id"], "moves": moves}
+
+
+	def get(self, key: str) -> dict:
+		""" Cached result under key, or None """
+		result = self.__entries.get(key)
+		if result is None:
+			self.misses += 1
+			return None
+		self.hits += 1
+		self.__entries.move_to_end(key)
+		return result
+
+
+	def put(self, key: str, result: dict) -> None:
+		""" Cache a result, appending it to the cache file when there is one """
+		result = {"moves": result["moves"], "outcome": result["outcome"]}
+		self.__insert(key, result)
+		if self.path is not None:
+			with open(self.path, "a") as file:
+				file.write(json.dumps({"key": key, "result": result}) + "\n")
+
+
+	def __insert(self, key: str, result: dict) -> None:
+		self.__entries[key] = result
+		self.__entries.move_to_end(key)
+		while len(self.__entries) > self.maxEntries:
+			self.__entries.popitem(last=False)
+
+
+	def __load(self) -> None:
+		""" Read the cache file, then rewrite it with only the entries that were kept """
+		if not os.path.exists(self.path):
+			return
+		lines = 0
+		with open(self.path, "r") as file:
+			for line in file:
+				lines += 1
+				try:
+					entry = json.loads(line)
+				except ValueError:
+					continue
+				self.__insert(entry["key"], entry["result"])
+
+		if lines > len(self.__entries):
+			temporary = self.path + ".tmp"
+			with open(temporary, "w") as file:
+				for key, result in self.__entries.items():
+					file.write(json.dumps({"key": key, "result": result}) + "\n")
+			os.replace(temporary, self.path)
@@ -0,0 +1,89 @@
+# DESCRIPTION:	Measures how the cost of a single MyAI.getAction call grows
+#				with board size. Random boards from 8x8 up to 100x100 are
+#				played to completion and every call into the agent is timed;
+#				with O(1) tile bookkeeping the median per-move cost should
+#				stay roughly flat as the board grows.
+#
+# USAGE:		python ScalingBenchmark.py [--sizes 8 16 32 64 100]
+#				[--density 0.05] [--games 3] [--seed 0] [--output report.json]
+#
+# NOTES:		- Latencies are reported like Benchmark.py: nearest-rank
+#				  p50/p95/p99 of the durations World records per agent call.
+#				- The same seed always gives the same boards.
+
+import argparse
+import json
+import random
+import statistics
+import time
+
+from Benchmark import percentiles
+from World import World
+
+
+DEFAULT_SIZES = [8, 16, 32, 64, 100]
+
+
+def randomBoard(size: int, density: float, rng: random.Random) -> "tuple": # type: ignore
+	""" Random size x size board whose start tile and its neighbours are mine free """
+	startX, startY = rng.randrange(size), rng.randrange(size)
+	patch = {(startX + dx, startY + dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1)}
+	candidates = [(x, y) for x in range(size) for y in range(size) if (x, y) not in patch]
+	mines = rng.sample(candidates, int(size * size * density))
+	return (startX, startY), mines
+
+
+def playGame(size: int, density: float, rng: random.Random) -> dict:
+	""" Play one random board and return its outcome, game time and the duration of every call into the agent """
+	start, mines = randomBoard(size, density, rng)
+	world = World.from_grid(size, size, start, mines)
+	begin = time.perf_counter()
+	outcome = world.run()
+	return {"win": outcome > 0, "seconds": time.perf_counter() - begin, "action_seconds": world.getAgentSeconds()}
+
+
+def runBenchmark(sizes: "list", density: float, games: int, seed: int) -> dict: # type: ignore
+	""" Play games random boards of every size and build the report """
+	rng = random.Random(seed)
+	report = {"settings": {"sizes": sizes, "density": density, "games": games, "seed": seed}, "sizes": {}}
+	for size in sizes:
+		played = [playGame(size, density, rng) for _ in range(games)]
+		actionSeconds = [t for game in played for t in game["action_seconds"]]
+		report["sizes"][str(size)] = {
+			"games": len(played),
+			"wins": sum(game["win"] for game in played),
+			"actions": len(actionSeconds),
+			"action_mean_us": round(statistics.fmean(actionSeconds) * 1e6, 3) if actionSeconds else None,
+			"action_latency_us": percentiles(actionSeconds, 1e6),
+		}
+	return report
+
+
+def printReport(report: dict) -> None:
+	""" Print a human readable table of the report """
+	print("size          games    actions   action mean us   action p50/p95/p99 us")
+	for size, summary in report["sizes"].items():
+		action = summary["action_latency_us"]
+		print(f"{size + 'x' + size:<10} {summary['games']:>8} {summary['actions']:>10} {summary['action_mean_us']:>16}"
+			f"   {action['p50']}/{action['p95']}/{action['p99']}")
+
+
+def main():
+	parser = argparse.ArgumentParser(description="Benchmark MyAI per-move cost across board sizes")
+	parser.add_argument("--sizes", help="Board side lengths to test", nargs="+", type=int, default=DEFAULT_SIZES)
+	parser.add_argument("--density", help="Fraction of tiles that are mines", type=float, default=0.05)
+	parser.add_argument("--games", help="Games per board size", type=int, default=3)
+	parser.add_argument("--seed", help="Random seed for board layouts", type=int, default=0)
+	parser.add_argument("--output", help="Write the JSON report to this path")
+	args = parser.parse_args()
+
+	report = runBenchmark(args.sizes, args.density, args.games, args.seed)
+	printReport(report)
+
+	if args.output:
+		with open(args.output, "w") as file:
+			json.dump(report, file, indent=2)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,127 @@
+# DESCRIPTION:	This file contains the Tracer class, which instruments MyAI to
+#				show where the time of a game goes. Attached to an agent, it
+#				records for every getAction / getActions call the wall time
+#				of each solver phase, the phase that produced the action,
+#				the frontier size, the number of frontier components and the
+#				nodes the forward checking search explored. Traces can be
+#				summarised per phase or exported as Chrome trace JSON, which
+#				chrome://tracing, Perfetto and speedscope all open.
+#
+# NOTES:		- MyAI only talks to the tracer at phase boundaries and only
+#				  when self.tracer is set, so an agent without a tracer pays
+#				  one attribute check per boundary.
+#				- Phases: percept (recording the last numbers), zeros (known
+#				  safe tiles), all_clear (no mines left), propagate, gauss,
+#				  forward_checking, probabilistic_guess and blind_guess.
+
+import json
+import time
+
+
+class Tracer():
+
+	def __init__(self, name: str = "MyAI"):
+		self.name = name			# thread name of the trace in the Chrome trace viewer
+		self.calls = []				# one record per getAction / getActions call
+		self.__ai = None
+		self.__origin = time.perf_counter_ns()
+		self.__call = None			# record of the call in progress
+		self.__phaseStart = 0
+
+
+	def attach(self, ai) -> "Tracer": # type: ignore
+		""" Trace every getAction / getActions call of ai, returning the tracer """
+		self.__ai = ai
+		ai.tracer = self
+		for method in ("getAction", "getActions"):
+			if hasattr(ai, method):
+				setattr(ai, method, self.__wrap(method, getattr(ai, method)))
+		return self
+
+
+	def mark(self, phase: str) -> None:
+		""" Close the running phase and start the next one """
+		now = time.perf_counter_ns() - self.__origin
+		call = self.__call
+		current = call["phase"]
+		call["phases"].append((current, self.__phaseStart, now - self.__phaseStart))
+		call["phase"] = phase
+		self.__phaseStart = now
+
+
+	def count(self, name: str, value: int) -> None:
+		""" Add value to a counter of the call in progress, such as the search nodes explored """
+		counters = self.__call["counters"]
+		counters[name] = counters.get(name, 0) + value
+
+
+	def summary(self) -> dict:
+		""" Totals per phase: time spent, calls it ran in and actions it produced """
+		phases = {}
+		for call in self.calls:
+			for phase, _, duration in call["phases"]:
+				entry = phases.setdefault(phase, {"ms": 0.0, "calls": 0, "actions": 0})
+				entry["ms"] += duration / 1e6
+				entry["calls"] += 1
+			phases.setdefault(call["phase"], {"ms": 0.0, "calls": 0, "actions": 0})["actions"] += call["actions"]
+		for entry in phases.values():
+			entry["ms"] = round(entry["ms"], 3)
+		return phases
+
+
+	def chromeTrace(self, pid: int = 1, tid: int = 1) -> "list": # type: ignore
+		""" Trace events of every call and phase, in the Chrome trace event format """
+		events = [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": self.name}}]
+		for call in self.calls:
+			events.append({
+				"name": call["method"], "ph": "X", "pid": pid, "tid": tid,
+				"ts": call["start"] / 1e3, "dur": call["duration"] / 1e3,
+				"args": {
+					"call": call["call"],
+					"action_phase": call["phase"],
+					"actions": call["actions"],
+					"frontier": call["frontier"],
+					**call["counters"],
+				},
+			})
+			for phase, start, duration in call["phases"]:
+				events.append({"name": phase, "ph": "X", "pid": pid, "tid": tid, "ts": start / 1e3, "dur": duration / 1e3})
+		return events
+
+
+	def save(self, path: str) -> None:
+		""" Write the trace as a Chrome trace JSON file """
+		with open(path, "w") as file:
+			json.dump({"traceEvents": self.chromeTrace(), "displayTimeUnit": "ms"}, file)
+
+
+	def __wrap(self, method: str, function):
+		def traced(percept):
+			self.__begin(method)
+			result = function(percept)
+			self.__end(result)
+			return result
+		return traced
+
+
+	def __begin(self, method: str) -> None:
+		start = time.perf_counter_ns() - self.__origin
+		self.__phaseStart = start
+		self.__call = {
+			"method": method,
+			"call": len(self.calls),
+			"start": start,
+			"phase": "percept",		# phase running now; once the call returns, the phase that produced its actions
+			"phases": [],			# (phase, start, duration) in ns since the tracer was created
+			"counters": {},
+		}
+
+
+	def __end(self, result) -> None:
+		call = self.__call
+		self.mark(call["phase"])
+		call["duration"] = self.__phaseStart - call["start"]
+		call["actions"] = len(result) if isinstance(result, list) else 1
+		call["frontier"] = len(self.__ai.constraintGraph.tileCells) if hasattr(self.__ai, "constraintGraph") else None
+		self.calls.append(call)
+		self.__call = None
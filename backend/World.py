@@ -3,29 +3,80 @@
 #				for representing, maintaining, and changing the state of
 #				the game.
 
+import logging
 import random
+import time
+import numpy as np
 from MyAI import MyAI
 from AI import AI
 
+# Per-move records are logged at DEBUG, so they cost nothing unless that level is enabled
+logger = logging.getLogger("World")
+
 
 class World():
 
-	# Tile class
-	class __Tile():
-		mine = False
-		covered = True
-		flag = False
-		number = 0
-		
+	def __init__(self, filename=None, aiType="myai", verbose=False, debug=False, batch=False, cascade=False, keyframeInterval=0):
+		self.__initState(verbose, debug, batch, cascade, keyframeInterval)
+
+		try:
+		# If file is provided, parse it and construct board from its contents
+			if filename != None:
+				with open(filename, 'r') as file:
+					rowDimension, colDimension = [int(x) for x in file.readline().split()]
+					startX, startY = [int(x)-1 for x in file.readline().split()]
+					mines = [(c, r)
+						for r, line in zip(range(rowDimension - 1, -1, -1), file.readlines())
+						for c, tile in zip(range(colDimension), line.split())
+						if tile == "1"]
+				self.__setUpBoard(rowDimension, colDimension, (startX, startY), mines)
+					
+		# If file not provided, construct board using defaults
+			else:
+				self.__createBoard()
+				self.__addMines()
+				self.__addNumbers()
+				self.__startGame(self.__getFirstMove())
+
+		except ValueError as e:
+			logger.error("Cannot create board: %s", e)
+
+		if (self.__verbose and filename):
+			print("Running on world: " + filename)
 
-	def __init__(self, filename=None, aiType="myai", verbose=False, debug=False):
+
+	@classmethod
+	def from_grid(cls, rows: int, cols: int, start: "tuple", mines: "iterable", aiType="myai", verbose=False, debug=False, batch=False, cascade=False, keyframeInterval=0) -> "World": # type: ignore
+		""" Construct a world directly from in-memory board data, start and mines are 0-indexed (x, y) coordinates """
+		world = cls.__new__(cls)
+		world.__initState(verbose, debug, batch, cascade, keyframeInterval)
+		world.__setUpBoard(rows, cols, start, mines)
+		return world
+
+
+	@classmethod
+	def from_pack(cls, pack: "ProblemPack", index: int, aiType="myai", verbose=False, debug=False, batch=False, cascade=False, keyframeInterval=0) -> "World": # type: ignore
+		""" Construct a world from a board of a memory-mapped ProblemPack """
+		rows, cols, startX, startY, _ = pack.header(index)
+		return cls.from_grid(rows, cols, (startX, startY), pack.mines(index), aiType, verbose, debug, batch, cascade, keyframeInterval)
+
+
+	def __initState(self, verbose: bool, debug: bool, batch: bool = False, cascade: bool = False, keyframeInterval: int = 0) -> None:
 		self.__verbose = verbose
 		self.__debug = debug
+		# Let agents that implement getActions play a whole batch of actions per call. Cascade mode opens
+		# whole zero regions at once and reports them as one batch of percepts, so it implies batch mode
+		self.__batch = batch or cascade
+		self.__cascade = cascade
 
 		self.__colDimension = 0
 		self.__rowDimension = 0
 		self.__score = 0
-		self.__board = None
+		# Board state as uint8 arrays indexed [x][y]
+		self.__mines = None
+		self.__numbers = None
+		self.__covered = None
+		self.__flags = None
 		self.__totalMines = 0
 		self.__flagsLeft = 0
 		self.__coveredTiles = 0
@@ -36,67 +87,68 @@ class World():
 		self.__lastTile = None
 		self.__lastAction = None
 		self.__moves = []
-
-		try:
-		# If file is provided, construct board based on file
-			if filename != None:
-				with open(filename, 'r') as file:
-					self.__createBoard(file)
-					firstMoveCoords = self.__getFirstMove(file)
-					self.__addMines(file)
-					self.__addNumbers()
-					self.__coveredTiles = self.__colDimension * self.__rowDimension
-					self.__flagsLeft = self.__totalMines
-					self.__uncoverTile(firstMoveCoords[0], firstMoveCoords[1])
-					self.__lastTile = (firstMoveCoords[0]+1, firstMoveCoords[1]+1)
-					self.__lastAction = "UNCOVER"
-					
-		# If file not provided, construct board using defaults
-			else:
-				self.__createBoard()
-				self.__addMines()
-				self.__addNumbers()
-				firstMoveCoords = self.__getFirstMove()
-				self.__coveredTiles = self.__colDimension * self.__rowDimension
-				self.__flagsLeft = self.__totalMines
-				self.__uncoverTile(firstMoveCoords[0], firstMoveCoords[1])
-				self.__lastTile = (firstMoveCoords[0]+1, firstMoveCoords[1]+1)
-				self.__lastAction = "UNCOVER"
-
-		except ValueError as e:
-			print("Error: Cannot create board!")
-
+		self.__ai = None
+		# Duration in seconds of every call into the agent, getAction or getActions
+		self.__agentSeconds = []
+		# Every keyframeInterval moves the covered and flag bitmaps are saved, so a replay can seek to any
+		# move by applying at most keyframeInterval moves to the nearest keyframe
+		self.__keyframeInterval = keyframeInterval
+		self.__keyframes = []
+
+
+	def __setUpBoard(self, rowDimension: int, colDimension: int, start: "tuple", mines: "iterable") -> None: # type: ignore
+		""" Build the board from its dimensions, first move and mine coordinates, then start the game """
+		self.__createBoard(rowDimension, colDimension)
+		startX, startY = start
+		if startX > self.__colDimension or startX < 0 or startY > self.__rowDimension or startY < 0:
+			raise ValueError('First move coordinates are invalid')
+		self.__addMines(mines)
+		self.__addNumbers()
+		self.__startGame((startX, startY))
+
+
+	def __startGame(self, firstMoveCoords: "tuple") -> None: # type: ignore
+		""" Uncover the first tile and hand the board over to the agent """
+		self.__coveredTiles = self.__colDimension * self.__rowDimension
+		self.__flagsLeft = self.__totalMines
+		self.__uncoverTile(firstMoveCoords[0], firstMoveCoords[1])
+		self.__lastTile = (firstMoveCoords[0]+1, firstMoveCoords[1]+1)
+		self.__lastAction = "UNCOVER"
 
 		self.__ai = MyAI(self.__rowDimension, self.__colDimension, self.__totalMines, firstMoveCoords[0], firstMoveCoords[1])
 
-		if (self.__verbose and filename):
-			print("Running on world: " + filename)
-
 
 	def run(self) -> int:
 		""" Engine of the game """
 		while (True):
+			if self.__batch and hasattr(self.__ai, "getActions"):
+				self.__runBatches()
+				break
+
 			if self.__movesMade > self.__movesLimit:
 				break;
 
 			try: 
+				begin = time.perf_counter()
 				try:
 					action = self.__ai.getAction(self.__perceptNumber)
 				except Exception as e:
-					print(e)
+					logger.exception("Agent failed in getAction: %s", e)
+				self.__agentSeconds.append(time.perf_counter() - begin)
 				if self.__checkValidAction(action):
 					if self.__doMove(action):
 						break
 			except ValueError:
-				print("Error: Invalid action!")
+				logger.warning("Invalid action")
 			except IndexError:
-				print("Error: Move is out of bounds!")
+				logger.warning("Move is out of bounds")
 
 			if self.__debug:
 				input("Press ENTER to continue...")
 		self.__handleGameover()
 		self.__uncoverAll()
-		self.__printBoardInfo()
+		if self.__verbose or self.__debug:
+			self.__printBoardInfo()
 		if self.__debug:
 			self.__printWorld()
 
@@ -113,6 +165,62 @@ class World():
 			return 0
 
 
+	def getAgent(self) -> "AI": # type: ignore
+		""" The agent playing this world """
+		return self.__ai
+
+
+	def getAgentSeconds(self) -> "list": # type: ignore
+		""" Duration in seconds of every getAction call during run, or of every getActions call in batch mode """
+		return self.__agentSeconds
+
+
+	def getKeyframes(self) -> "list": # type: ignore
+		""" Keyframes saved during run: the packed [x][y] covered and flag bitmaps before move number "move" """
+		return self.__keyframes
+
+
+	def __runBatches(self) -> None:
+		""" Play through the agent's getActions: apply each batch in one pass and answer with the batch of percepts """
+		startX, startY = self.__lastTile[0] - 1, self.__lastTile[1] - 1
+		percepts = [(startX, startY, self.__perceptNumber)]
+		if self.__cascade and self.__perceptNumber == 0:
+			percepts += self.__cascadeFrom(startX, startY)
+		while self.__movesMade <= self.__movesLimit:
+			begin = time.perf_counter()
+			try:
+				actions = self.__ai.getActions(percepts)
+			except Exception as e:
+				logger.exception("Agent failed in getActions: %s", e)
+				return
+			finally:
+				self.__agentSeconds.append(time.perf_counter() - begin)
+			if not actions:
+				return
+
+			percepts = []
+			for action in actions:
+				if self.__movesMade > self.__movesLimit:
+					return
+				try:
+					if self.__checkValidAction(action):
+						# A cascade earlier in the batch may already have opened this tile and reported it
+						if self.__cascade and action.getMove() == AI.Action.UNCOVER and not self.__covered[action.getX(), action.getY()]:
+							continue
+						if self.__doMove(action):
+							return
+						percepts.append((action.getX(), action.getY(), self.__perceptNumber))
+						if self.__cascade and action.getMove() == AI.Action.UNCOVER and self.__perceptNumber == 0:
+							percepts += self.__cascadeFrom(action.getX(), action.getY())
+				except ValueError:
+					logger.warning("Invalid action")
+				except IndexError:
+					logger.warning("Move is out of bounds")
+
+			if self.__debug:
+				input("Press ENTER to continue...")
+
+
 	###############################################
 	#				ACTIONS ON BOARD 			  #
 	###############################################
@@ -137,8 +245,8 @@ class World():
 			X = actionObj.getX()
 			Y = actionObj.getY()
 
-			# Debug logging: print move and coordinates
-			print(f"Processing move: {move}, Coordinates: ({X}, {Y})")
+			if logger.isEnabledFor(logging.DEBUG):
+				logger.debug("move action=%s x=%d y=%d", move, X, Y)
 
 			# Create the move_info dictionary using the extracted values
 			# Update last tile and action based on the move
@@ -158,16 +266,16 @@ class World():
 				"y": Y + 1
 			}
 			if move == AI.Action.UNCOVER:
-				move_info["result"] = self.__board[X][Y].number
-			self.__moves.append(move_info)
+				move_info["result"] = int(self.__numbers[X, Y])
+			self.__logMove(move_info)
 
 			# Execute the move on the board
 			if move == AI.Action.LEAVE:
-				print("Leaving game...")
+				logger.debug("leave moves=%d", self.__movesMade)
 				return True  # Agent decides to leave game
 			elif move == AI.Action.UNCOVER:
-				if self.__board[X][Y].mine:
-					print(f"Gameover! Uncovered a mine at: ({X+1}, {Y+1})")
+				if self.__mines[X, Y]:
+					logger.debug("gameover x=%d y=%d moves=%d", X + 1, Y + 1, self.__movesMade)
 					return True  # Agent uncovered a mine
 				self.__uncoverTile(X, Y)
 			elif move == AI.Action.FLAG:
@@ -177,8 +285,7 @@ class World():
 			
 			return False  # Game continues
 		except Exception as e:
-			# Log detailed error info to help with debugging
-			print(f"Error in __doMove: {e}")
+			logger.error("Error in __doMove: %s", e)
 			raise
 
 
@@ -187,43 +294,36 @@ class World():
 	#####################################################
 	#			SETTING UP THE GAME BOARD   			#
 	#####################################################
-	def __createBoard(self, inputStream: "filePointer" = None) -> None: # type: ignore
-		""" Creates 2D tile array from first line of file and instantiates board instance variable """
-		if inputStream:
-			self.__rowDimension, self.__colDimension = [int(x) for x in inputStream.readline().split()]
-			self.__board = [[self.__Tile() for i in range(self.__rowDimension)] for j in range(self.__colDimension)]
-		else:
-			self.__colDimension = 8		# Default sizes
-			self.__rowDimension = 8		# Default size
-
-			self.__board = [[self.__Tile() for i in range(self.__rowDimension)] for j in range(self.__colDimension)]
+	def __createBoard(self, rowDimension: int = 8, colDimension: int = 8) -> None:
+		""" Creates 2D tile array of the given dimensions and instantiates board instance variable """
+		self.__rowDimension = rowDimension
+		self.__colDimension = colDimension
+		shape = (self.__colDimension, self.__rowDimension)
+		self.__mines = np.zeros(shape, dtype=np.uint8)
+		self.__numbers = np.zeros(shape, dtype=np.uint8)
+		self.__covered = np.ones(shape, dtype=np.uint8)
+		self.__flags = np.zeros(shape, dtype=np.uint8)
 		
 		self.__movesLimit = self.__colDimension * self.__rowDimension * 2
 
 
-	def __getFirstMove(self, inputStream: "filePointer" = None) -> "tuple": # type: ignore
+	def __getFirstMove(self) -> "tuple": # type: ignore
 		""" Find the first move to be given to the agent, must be a "0" tile """
-		if inputStream:
-			startX, startY = [int(x)-1 for x in inputStream.readline().split()]
-			if startX > self.__colDimension or startX < 0 or startY > self.__rowDimension or startY < 0:
-				raise ValueError('First move coordinates are invalid')
-		else:
+		startX = self.__randomInt(self.__colDimension)
+		startY = self.__randomInt(self.__rowDimension)
+		while (self.__numbers[startX, startY] != 0 or self.__mines[startX, startY]):
 			startX = self.__randomInt(self.__colDimension)
 			startY = self.__randomInt(self.__rowDimension)
-			while (self.__board[startX][startY].number != 0 or self.__board[startX][startY].mine):
-				startX = self.__randomInt(self.__colDimension)
-				startY = self.__randomInt(self.__rowDimension)
 		return (startX, startY)
 
 
-	def __addMines(self, inputStream: "filePointer" = None) -> None: # type: ignore
+	def __addMines(self, mineCoords: "iterable" = None) -> None: # type: ignore
 		""" Add mines to the game board""" 
-		if inputStream:
-			# This is the existing method for reading from a provided input stream
-			for r, line in zip(range(self.__rowDimension - 1, -1, -1), inputStream.readlines()):
-				for c, tile in zip(range(self.__colDimension), line.split()):
-					if tile == "1":
-						self.__addMine(c, r)
+		if mineCoords is not None:
+			# Place mines at the provided 0-indexed (x, y) coordinates in one scatter
+			coords = np.array(list(mineCoords), dtype=np.intp).reshape(-1, 2)
+			self.__mines[coords[:, 0], coords[:, 1]] = 1
+			self.__totalMines = int(np.count_nonzero(self.__mines))
 		else:
 			# Default method for creating a random board if no input stream is provided
 			import os
@@ -249,7 +349,7 @@ class World():
 				while currentMines < 10:  # Default number of mines is 10
 					r = self.__randomInt(self.__rowDimension)
 					c = self.__randomInt(self.__colDimension)
-					if not self.__board[c][r].mine:
+					if not self.__mines[c, r]:
 						self.__addMine(c, r)
 						currentMines += 1
 				return
@@ -273,52 +373,74 @@ class World():
 
 					
 	def __addMine(self, c: int, r: int) -> None:
-		""" Add mine to tile located at (c, r) and update the Tile.mine attrbute """
-		self.__board[c][r].mine = True
+		""" Add mine to tile located at (c, r) and update the mine array """
+		self.__mines[c, r] = 1
 		self.__totalMines += 1		
 
 
 	def __addNumbers(self) -> None:
-		""" Iterate the board and add hint numbers for each mine """
-		for r in range(self.__rowDimension):
-			for c in range(self.__colDimension):
-				if self.__board[c][r].mine:
-					self.__addHintNumber(c, r+1)
-					self.__addHintNumber(c, r-1)
-					self.__addHintNumber(c+1, r)
-					self.__addHintNumber(c-1, r)
-					self.__addHintNumber(c-1, r+1)
-					self.__addHintNumber(c+1, r+1)
-					self.__addHintNumber(c-1, r-1)
-					self.__addHintNumber(c+1, r-1)
-
-
-	def __addHintNumber(self, c: int, r: int) -> None:
-		""" Increment the hint number of a tile """
-		if self.__isInBounds(c, r):
-			self.__board[c][r].number += 1
+		""" Compute every hint number at once as a 3x3 neighbourhood sum of the mine array """
+		cols, rows = self.__mines.shape
+		padded = np.pad(self.__mines, 1)
+		numbers = np.zeros(self.__mines.shape, dtype=np.uint8)
+		for dc in range(3):
+			for dr in range(3):
+				numbers += padded[dc:dc + cols, dr:dr + rows]
+		# The sum includes the tile itself, hint numbers only count the neighbours
+		self.__numbers = numbers - self.__mines
 
 
 	def __uncoverTile(self, c: int, r: int) -> None:
 		""" Uncovers a tile """
-		if self.__board[c][r].covered:
-			self.__board[c][r].covered = False
+		if self.__covered[c, r]:
+			self.__covered[c, r] = 0
 			self.__coveredTiles -= 1
-		self.__perceptNumber = self.__board[c][r].number
+		self.__perceptNumber = int(self.__numbers[c, r])
+
+
+	def __logMove(self, moveInfo: dict) -> None:
+		""" Append a move to the move log, saving a keyframe of the board as it was before every K-th move """
+		if self.__keyframeInterval and len(self.__moves) % self.__keyframeInterval == 0:
+			self.__keyframes.append({
+				"move": len(self.__moves),
+				"covered": np.packbits(self.__covered).tobytes(),
+				"flags": np.packbits(self.__flags).tobytes(),
+			})
+		self.__moves.append(moveInfo)
+
+
+	def __cascadeFrom(self, c: int, r: int) -> "list": # type: ignore
+		"""
+		Open the whole zero region around an uncovered 0 with an explicit stack. Every opened tile is logged in
+		the move list like an uncover of the agent, and returned as an (x, y, number) percept
+		"""
+		percepts = []
+		stack = [(c, r)]
+		while stack:
+			x, y = stack.pop()
+			for nx in range(max(0, x - 1), min(self.__colDimension, x + 2)):
+				for ny in range(max(0, y - 1), min(self.__rowDimension, y + 2)):
+					if self.__covered[nx, ny] and not self.__flags[nx, ny]:
+						self.__covered[nx, ny] = 0
+						self.__coveredTiles -= 1
+						number = int(self.__numbers[nx, ny])
+						self.__logMove({"action": "UNCOVER", "x": nx + 1, "y": ny + 1, "result": number})
+						percepts.append((nx, ny, number))
+						if number == 0:
+							stack.append((nx, ny))
+		return percepts
 
 
 	def __uncoverAll(self) -> None:
 		""" Uncovers all tiles """
-		for r in range(self.__rowDimension):
-			for c in range(self.__colDimension):
-				self.__uncoverTile(c, r)
+		self.__covered[:] = 0
 		self.__coveredTiles = 0
 
 
 	def __flagTile(self, c: int, r: int) -> None:
 		""" Flag a tile, coordinates adjusted to fix indexing """
-		if self.__board[c][r].covered and not self.__board[c][r].flag and self.__flagsLeft > 0:
-			self.__board[c][r].flag = True
+		if self.__covered[c, r] and not self.__flags[c, r] and self.__flagsLeft > 0:
+			self.__flags[c, r] = 1
 			self.__flagsLeft -= 1
 		if self.__flagsLeft < 0:
 			self.__flagsLeft = 0
@@ -327,8 +449,8 @@ class World():
 
 	def __unflagTile(self, c: int, r: int) -> None:
 		""" Unflag a tile, coordinates adjusted to fix indexing """
-		if self.__board[c][r].covered and self.__board[c][r].flag:
-			self.__board[c][r].flag = False
+		if self.__covered[c, r] and self.__flags[c, r]:
+			self.__flags[c, r] = 0
 			self.__flagsLeft += 1
 		if self.__flagsLeft > 10:
 			self.__flagsLeft = 10
@@ -337,11 +459,8 @@ class World():
 
 	def __handleGameover(self) -> None:
 		""" Check game board for completion after AI is done """
-		for r in range(self.__rowDimension):
-			for c in range(self.__colDimension):
-				# If all safe tiles are uncovered
-				if not self.__board[c][r].covered and not self.__board[c][r].mine:
-					self.__score += 1
+		# Count the uncovered safe tiles
+		self.__score += int(np.count_nonzero((self.__covered == 0) & (self.__mines == 0)))
 
 
 	#############################################
@@ -385,13 +504,13 @@ class World():
 
 	def __printTileInfo(self, c: int, r: int) -> None:
 		""" Checks tile attributes and prints accordingly """
-		if not self.__board[c][r].covered and self.__board[c][r].mine:
+		if not self.__covered[c, r] and self.__mines[c, r]:
 			print('B ', end=" ")
-		elif not self.__board[c][r].covered:
-			print(str(self.__board[c][r].number) + ' ', end=" ")
-		elif self.__board[c][r].flag:
+		elif not self.__covered[c, r]:
+			print(str(self.__numbers[c, r]) + ' ', end=" ")
+		elif self.__flags[c, r]:
 			print('? ', end=" ")
-		elif self.__board[c][r].covered:
+		elif self.__covered[c, r]:
 			print('. ', end=" ")
 		
 
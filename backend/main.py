@@ -1,10 +1,104 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Header, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import StreamingResponse, Response
 from pydantic import BaseModel
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Literal
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import asynccontextmanager
+from collections import deque
+import asyncio
+import json
+import logging
 import os
+import time
 
-app = FastAPI()
+from ProblemPack import ProblemPack, DEFAULT_PACK, packIsCurrent
+from Jobs import BoundedStore, Job
+from ResultCache import ResultCache
+from MoveLog import encodeMovesBase64
+from Replay import Replay
+from ProblemIndex import ProblemIndex, DEFAULT_INDEX, METRICS, entryGrid
+from Metrics import Registry, Counter, Gauge, Histogram, CONTENT_TYPE, GAME_BUCKETS, MOVE_BUCKETS
+
+# LOG_LEVEL=DEBUG also logs every move World plays, which slows the solver down
+logging.basicConfig(level=os.environ.get("LOG_LEVEL", "INFO").upper(), format="%(asctime)s %(levelname)s %(name)s %(message)s")
+logger = logging.getLogger("api")
+
+# Worker processes used to solve games off the event loop
+pool = None
+
+# Results of boards already played. RESULT_CACHE_PATH persists them across restarts and
+# RESULT_CACHE_SYMMETRY=1 lets boards equal up to a rotation or reflection share one entry
+RESULT_CACHE_SIZE = 10000
+result_cache = None
+
+# Difficulty index of the Problems corpus behind the selection options of /api/generate.
+# PROBLEM_INDEX_PATH moves the file it is kept in
+problem_index = None
+
+# The index and the staleness of the packed corpus are worked out at startup and again every
+# CORPUS_REFRESH seconds off the event loop, as both stat every world file; requests only read them
+CORPUS_REFRESH = 60
+
+# Memory-mapped copy of the Problems corpus and the mtime of the file it was opened from
+problem_pack = None
+problem_pack_mtime = None
+# Mtime of the pack when no world file was found to be newer than it, None when it is stale or missing
+problem_pack_current = None
+
+def check_problem_pack():
+    """Compare the pack with every world file and record whether it can be served."""
+    global problem_pack_current
+    pack_path = os.path.join(os.getcwd(), DEFAULT_PACK)
+    try:
+        pack_mtime = os.path.getmtime(pack_path)
+    except OSError:
+        problem_pack_current = None
+        return
+    problem_pack_current = pack_mtime if packIsCurrent(pack_path, os.path.join(os.getcwd(), "Problems")) else None
+
+def refresh_corpus():
+    problem_index.refresh()
+    check_problem_pack()
+
+async def refresh_corpus_periodically():
+    """Pick up added, changed and deleted world files, and save recorded solve times, in the background."""
+    loop = asyncio.get_running_loop()
+    while True:
+        await asyncio.sleep(CORPUS_REFRESH)
+        try:
+            await loop.run_in_executor(None, refresh_corpus)
+        except Exception:
+            logger.exception("Problem corpus refresh failed")
+
+def _warm_up():
+    """Import the solver inside a worker so the first real game doesn't pay for it."""
+    import World
+    return os.getpid()
+
+@asynccontextmanager
+async def lifespan(app):
+    global pool, result_cache, problem_index
+    result_cache = ResultCache(RESULT_CACHE_SIZE, os.environ.get("RESULT_CACHE_PATH"),
+                               os.environ.get("RESULT_CACHE_SYMMETRY") == "1")
+    problem_index = ProblemIndex(os.path.join(os.getcwd(), "Problems"), os.environ.get("PROBLEM_INDEX_PATH", DEFAULT_INDEX))
+    workers = os.cpu_count() or 1
+    pool = ProcessPoolExecutor(max_workers=workers)
+    # Start every worker up front so the first /api/process call is not slowed by process spawning,
+    # and index the corpus meanwhile on a thread
+    loop = asyncio.get_running_loop()
+    await asyncio.gather(loop.run_in_executor(None, refresh_corpus),
+                         *(loop.run_in_executor(pool, _warm_up) for _ in range(workers)))
+    logger.info("Started solver pool with %d workers, %d boards indexed", workers, len(problem_index.boards))
+    corpus_refresher = asyncio.create_task(refresh_corpus_periodically())
+    yield
+    corpus_refresher.cancel()
+    # Keep the solve times recorded since the last refresh
+    await loop.run_in_executor(None, problem_index.save)
+    pool.shutdown(cancel_futures=True)
+    pool = None
+
+app = FastAPI(lifespan=lifespan)
 
 # Enable CORS
 app.add_middleware(
@@ -15,13 +109,75 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Store retrieved problems in memory
-problems = []
-results = []
+# Generated problems of every session and the jobs solving them, both dropped when unused for an hour
+SESSION_TTL = 3600
+MAX_SESSIONS = 1024
+MAX_JOBS = 256
+sessions = BoundedStore(MAX_SESSIONS, SESSION_TTL)
+jobs = BoundedStore(MAX_JOBS, SESSION_TTL, onEvict=lambda job: job.cancel())
+
+# Solved games keep a board keyframe every KEYFRAME_INTERVAL moves, so replays can seek in O(K)
+KEYFRAME_INTERVAL = 64
+MAX_REPLAYS = 256
+replays = BoundedStore(MAX_REPLAYS, SESSION_TTL)
+
+# Prometheus metrics served by /api/metrics
+GAMES_PER_SECOND_WINDOW = 60
+finished_games = deque()    # finish times of the games of the last GAMES_PER_SECOND_WINDOW seconds
+solver_queue_depth = 0      # games handed to the pool that have not finished yet
+
+def games_per_second():
+    cutoff = time.monotonic() - GAMES_PER_SECOND_WINDOW
+    while finished_games and finished_games[0] < cutoff:
+        finished_games.popleft()
+    return len(finished_games) / GAMES_PER_SECOND_WINDOW
+
+def cache_hit_ratio():
+    lookups = result_cache.hits + result_cache.misses if result_cache else 0
+    return result_cache.hits / lookups if lookups else 0.0
+
+metrics = Registry()
+REQUEST_SECONDS = metrics.register(Histogram("minesweeper_request_duration_seconds", "Time to the response headers per route",
+                                             labels=("method", "route", "status")))
+GAMES = metrics.register(Counter("minesweeper_games_total", "Games answered, by outcome and by whether the solver or the cache answered",
+                                 labels=("outcome", "source")))
+GAMES_PER_SECOND = metrics.register(Gauge("minesweeper_games_per_second", f"Games answered per second over the last {GAMES_PER_SECOND_WINDOW} s",
+                                          function=games_per_second))
+GAME_SECONDS = metrics.register(Histogram("minesweeper_game_duration_seconds", "Time to solve one game in a worker", GAME_BUCKETS))
+MOVE_SECONDS = metrics.register(Histogram("minesweeper_move_duration_seconds", "Time MyAI takes per call to choose its next move, or its next batch of moves", MOVE_BUCKETS))
+SEARCH_TIMEOUTS = metrics.register(Counter("minesweeper_search_timeouts_total", "Frontier components whose forward_checking search hit its time limit"))
+QUEUE_DEPTH = metrics.register(Gauge("minesweeper_solver_queue_depth", "Games waiting for or running in the solver pool",
+                                     function=lambda: solver_queue_depth))
+CACHE_LOOKUPS = metrics.register(Counter("minesweeper_result_cache_lookups_total", "Result cache lookups", labels=("result",)))
+CACHE_HIT_RATIO = metrics.register(Gauge("minesweeper_result_cache_hit_ratio", "Result cache hits over lookups since start",
+                                         function=cache_hit_ratio))
+CACHE_ENTRIES = metrics.register(Gauge("minesweeper_result_cache_entries", "Results held by the result cache",
+                                       function=lambda: len(result_cache) if result_cache else 0))
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    begin = time.perf_counter()
+    response = await call_next(request)
+    # Label by the route template, not the raw path, so ids do not blow up the series count
+    route = request.scope.get("route")
+    REQUEST_SECONDS.observe(time.perf_counter() - begin, method=request.method,
+                            route=route.path if route else "unmatched", status=response.status_code)
+    return response
+
+class BoardRange(BaseModel):
+    min: Optional[float] = None
+    max: Optional[float] = None
 
 class GenerateRequest(BaseModel):
     difficulty: str
     count: int
+    # Selection answered from the problem index instead of the first boards in file name order:
+    # metric -> range to keep, metric to sort by, or a random sample that seed makes repeatable
+    filters: Optional[Dict[str, BoardRange]] = None
+    sort: Optional[Literal[METRICS]] = None
+    descending: bool = False
+    sample: bool = False
+    seed: Optional[int] = None
 
 class GenerateResponse(BaseModel):
     problems: List[Dict[str, Any]]
@@ -29,6 +185,12 @@ class GenerateResponse(BaseModel):
 class ProcessResponse(BaseModel):
     results: List[Dict[str, Any]]
 
+# How moves are sent: JSON objects, or base64 MoveLog records
+MovesEncoding = Literal["json", "binary"]
+
+class JobRequest(BaseModel):
+    problems: Optional[List[Dict[str, Any]]] = None
+
 def difficulty_to_params(difficulty):
     """Fallback function in case you need grid parameters for other logic."""
     if difficulty.lower() == "beginner":
@@ -40,10 +202,27 @@ def difficulty_to_params(difficulty):
     else:
         return {"rows": 8, "cols": 8, "mines": 10}  # Default to beginner
 
+def get_problem_pack():
+    """Return the packed corpus if the last corpus check found it at least as new as the world files, else None."""
+    global problem_pack, problem_pack_mtime
+    pack_path = os.path.join(os.getcwd(), DEFAULT_PACK)
+    try:
+        pack_mtime = os.path.getmtime(pack_path)
+    except OSError:
+        return None
+    # A pack rebuilt since the last check is not served until the next check has compared it
+    if pack_mtime != problem_pack_current:
+        return None
+    # Reopen if the pack was rebuilt since it was mapped
+    if problem_pack is None or pack_mtime != problem_pack_mtime:
+        problem_pack = ProblemPack(pack_path)
+        problem_pack_mtime = pack_mtime
+    return problem_pack
+
 @app.post("/api/generate", response_model=GenerateResponse)
-async def generate_problems(request: GenerateRequest):
-    global problems
+async def generate_problems(request: GenerateRequest, x_session_id: str = Header("default")):
     problems = []
+    sessions.put(x_session_id, problems)
     
     # Determine the difficulty prefix (e.g., "Beginner")
     difficulty = request.difficulty.lower()
@@ -58,6 +237,42 @@ async def generate_problems(request: GenerateRequest):
     else:
         problems_dir = base_problems_dir
 
+    # Filtered, sorted or sampled selections come from the index, which holds the boards themselves
+    if request.filters or request.sort or request.sample:
+        filters = {metric: (bounds.min, bounds.max) for metric, bounds in (request.filters or {}).items()}
+        try:
+            selected = problem_index.select(prefix, request.count, filters, request.sort, request.descending,
+                                            request.sample, request.seed)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        for i, (name, entry) in enumerate(selected):
+            problems.append({
+                "id": i,
+                "name": name,
+                "grid": entryGrid(entry),
+                "start_x": entry["start_x"],
+                "start_y": entry["start_y"],
+                "rows": entry["rows"],
+                "cols": entry["cols"],
+            })
+        return {"problems": problems}
+
+    # Read boards straight out of the packed corpus when it is available
+    pack = get_problem_pack()
+    if pack is not None:
+        for i, index in enumerate(pack.find(prefix)[:request.count]):
+            rows, cols, start_x, start_y, _ = pack.header(index)
+            problems.append({
+                "id": i,
+                "name": pack.name(index),
+                "grid": pack.grid(index),
+                "start_x": start_x,
+                "start_y": start_y,
+                "rows": rows,
+                "cols": cols,
+            })
+        return {"problems": problems}
+
     # List files that start with the difficulty prefix and end with .txt
     file_list = [f for f in os.listdir(problems_dir) if f.startswith(prefix) and f.endswith(".txt")]
     file_list = sorted(file_list)  # Sort files alphabetically (or adjust sort logic as needed)
@@ -82,6 +297,7 @@ async def generate_problems(request: GenerateRequest):
         # Construct problem dictionary. Adjust start_x/start_y to 0-indexed if needed.
         problem = {
             "id": i,
+            "name": filename,
             "grid": grid,
             "start_x": start_x - 1,
             "start_y": start_y - 1,
@@ -93,76 +309,220 @@ async def generate_problems(request: GenerateRequest):
     
     return {"problems": problems}
 
-@app.post("/api/process", response_model=ProcessResponse)
-async def process_problems():
-    global problems, results
-    results = []
-    
-    print(f"Processing {len(problems)} problems")  # Explicit logging
-    
-    if not problems:
-        raise HTTPException(status_code=400, detail="No problems to process. Generate problems first.")
-    
-    for problem in problems:
-        try:
-            # Create a temporary world file
-            temp_file = f"temp_world_{problem['id']}.txt"
-            with open(temp_file, "w") as f:
-                f.write(f"{problem['rows']} {problem['cols']}\n")
-                f.write(f"{problem['start_x'] + 1} {problem['start_y'] + 1}\n")
-                
-                # Write grid with mines (1) and safe tiles (0)
-                for row in reversed(problem['grid']):
-                    f.write(" ".join("1" if cell == 1 else "0" for cell in row) + "\n")
-            
-            # Create world and run AI
-            from World import World
-            world = World(filename=temp_file, aiType="myai", verbose=False, debug=False)
-            outcome = world.run()
-            
-            # Extract moves from the AI
-            moves = []
-            for move in world.get_moves():
-                move_type = "reveal" if move["action"] == "UNCOVER" else "flag"
-                moves.append({
-                    "x": move["x"] - 1,  # Adjust to 0-indexed
-                    "y": move["y"] - 1,  # Adjust to 0-indexed
-                    "type": move_type,
-                    "result": move.get("result", "")
-                })
-
-            outcome_str = "win" if outcome > 0 else "lose"
-            if outcome_str == "lose" and moves:
-                if moves[-1]["type"] == "reveal":
-                    moves[-1]["type"] = "exploded"
-            elif outcome_str == "win" and moves:
-                moves.pop()
-            
-            results.append({
-                "id": problem["id"],
-                "moves": moves,
-                "outcome": outcome_str
-            })
-            
-            if os.path.exists(temp_file):
-                os.remove(temp_file)
+def solve_problem(problem):
+    """Run MyAI on a single problem and return its moves and outcome. Executed inside a pool worker."""
+    try:
+        # Build the world straight from the problem held in memory; grid rows are indexed by y
+        mines = [(x, y) for y, row in enumerate(problem["grid"]) for x, cell in enumerate(row) if cell == 1]
+        world = World.from_grid(problem["rows"], problem["cols"], (problem["start_x"], problem["start_y"]), mines,
+                                aiType="myai", verbose=False, debug=False, keyframeInterval=KEYFRAME_INTERVAL)
+
+        begin = time.perf_counter()
+        outcome = world.run()
+        game_seconds = time.perf_counter() - begin
+        ai = world.getAgent()
+
+        # World times every call into the agent; the histogram is handed back to the API process with the result
+        move_seconds = Histogram("move", "", MOVE_BUCKETS)
+        for seconds in world.getAgentSeconds():
+            move_seconds.observe(seconds)
         
-        except Exception as e:
-            print(f"Error processing problem {problem['id']}: {e}")
-            results.append({
-                "id": problem["id"],
-                "moves": [],
-                "outcome": "error"
+        # Extract moves from the AI
+        moves = []
+        for move in world.get_moves():
+            move_type = "reveal" if move["action"] == "UNCOVER" else "flag"
+            moves.append({
+                "x": move["x"] - 1,  # Adjust to 0-indexed
+                "y": move["y"] - 1,  # Adjust to 0-indexed
+                "type": move_type,
+                "result": move.get("result", "")
             })
+
+        outcome_str = "win" if outcome > 0 else "lose"
+        if outcome_str == "lose" and moves:
+            if moves[-1]["type"] == "reveal":
+                moves[-1]["type"] = "exploded"
+        elif outcome_str == "win" and moves:
+            moves.pop()
+
+        return {
+            "id": problem["id"],
+            "moves": moves,
+            "outcome": outcome_str,
+            "keyframes": world.getKeyframes(),
+            "stats": {
+                "game_seconds": game_seconds,
+                "move_seconds": move_seconds.snapshot(),
+                "search_timeouts": ai.searchTimeouts,
+                "sampled_components": ai.sampledComponents,
+            }
+        }
     
-    print(f"Processed results: {results}")
-    return {"results": results}
+    except Exception as e:
+        logger.exception("Error processing problem %s: %s", problem["id"], e)
+        return {
+            "id": problem["id"],
+            "moves": [],
+            "outcome": "error"
+        }
+
+def record_game(result, source, problem=None):
+    """Count an answered game and fold the timings a worker measured into the metrics and the problem index."""
+    GAMES.inc(outcome=result["outcome"], source=source)
+    finished_games.append(time.monotonic())
+    stats = result.pop("stats", None)
+    if stats:
+        # A request can carry any name, so only boards that are their index entry are recorded
+        if problem is not None and problem_index.matches(problem):
+            problem_index.recordSolve(problem["name"], stats["game_seconds"])
+        GAME_SECONDS.observe(stats["game_seconds"])
+        MOVE_SECONDS.merge(stats["move_seconds"])
+        SEARCH_TIMEOUTS.inc(stats["search_timeouts"])
+
+async def solve_cached(problem):
+    """Answer a problem from the result cache, or solve it on the pool and cache the result."""
+    global solver_queue_depth
+    loop = asyncio.get_running_loop()
+    key, solved, symmetry = result_cache.prepare(problem)
+    result = result_cache.get(key)
+    CACHE_LOOKUPS.inc(result="miss" if result is None else "hit")
+    if result is None:
+        solver_queue_depth += 1
+        try:
+            result = await loop.run_in_executor(pool, solve_problem, solved)
+        finally:
+            solver_queue_depth -= 1
+        # Sampled probabilities and searches cut off by the time limit depend on timing, so a game with
+        # either could play differently next time
+        stats = result.get("stats", {})
+        repeatable = not stats.get("sampled_components") and not stats.get("search_timeouts")
+        record_game(result, "solver", problem)
+        if result["outcome"] == "error":
+            return {**result, "id": problem["id"]}
+        if repeatable:
+            result_cache.put(key, result)
+    else:
+        record_game(result, "cache")
+    return result_cache.restore(result, problem, symmetry)
+
+def start_job(session, problems=None):
+    """Start a job solving the given problems, or the ones last generated by the session."""
+    if problems is None:
+        problems = sessions.get(session)
+    if not problems:
+        raise HTTPException(status_code=400, detail="No problems to process. Generate problems first.")
+    job = Job(session, problems)
+    jobs.put(job.id, job)
+    job.start(solve_cached)
+    logger.info("Started job %s with %d problems", job.id, len(problems))
+    return job
+
+def get_job(job_id, session):
+    """Return a job of the session, or 404 if it does not exist, has expired or belongs to another session."""
+    job = jobs.get(job_id)
+    if job is None or job.session != session:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+def encode_result(result, moves_encoding):
+    """Return a result with its moves in the requested encoding: "json" objects or "binary" base64 records."""
+    # Keyframes stay on the server, they are only used to answer board state requests
+    result = {key: value for key, value in result.items() if key != "keyframes"}
+    if moves_encoding == "json":
+        return result
+    return {**result, "moves": encodeMovesBase64(result["moves"]), "moves_encoding": "binary"}
+
+async def stream_job(job, offset=0, cancel_on_disconnect=False, moves_encoding="json"):
+    """Yield every result of a job as one NDJSON line as soon as its game finishes."""
+    try:
+        async for result in job.events(offset):
+            yield json.dumps(encode_result(result, moves_encoding)) + "\n"
+    finally:
+        if cancel_on_disconnect:
+            job.cancel()
+
+@app.post("/api/process", response_model=ProcessResponse)
+async def process_problems(moves_encoding: MovesEncoding = "json", x_session_id: str = Header("default")):
+    job = start_job(x_session_id)
+    await job.task
+    logger.info("Processed %d results", len(job.results))
+    return {"results": [encode_result(result, moves_encoding) for result in job.sortedResults()]}
+
+
+@app.post("/api/process/stream")
+async def process_problems_stream(moves_encoding: MovesEncoding = "json", x_session_id: str = Header("default")):
+    """Solve the generated problems and send each result as one NDJSON line as soon as its game finishes."""
+    job = start_job(x_session_id)
+    # The client owns this job, so games still queued are dropped when it goes away
+    return StreamingResponse(stream_job(job, cancel_on_disconnect=True, moves_encoding=moves_encoding),
+                             media_type="application/x-ndjson", headers={"X-Job-Id": job.id})
+
+
+@app.post("/api/jobs")
+async def create_job(request: JobRequest = None, x_session_id: str = Header("default")):
+    """Start solving a batch in the background and return its job id right away."""
+    job = start_job(x_session_id, request.problems if request else None)
+    return job.progress()
+
+
+@app.get("/api/jobs/{job_id}")
+async def get_job_progress(job_id: str, x_session_id: str = Header("default")):
+    return get_job(job_id, x_session_id).progress()
+
+
+@app.get("/api/jobs/{job_id}/results")
+async def get_job_results(job_id: str, moves_encoding: MovesEncoding = "json", x_session_id: str = Header("default")):
+    """Results finished so far, ordered by problem id, with the job status."""
+    job = get_job(job_id, x_session_id)
+    results = [encode_result(result, moves_encoding) for result in job.sortedResults()]
+    return {**job.progress(), "results": results}
+
+
+@app.get("/api/jobs/{job_id}/events")
+async def get_job_events(job_id: str, offset: int = 0, moves_encoding: MovesEncoding = "json", x_session_id: str = Header("default")):
+    """Subscribe to a job: its results as NDJSON lines from position offset on, until it finishes."""
+    job = get_job(job_id, x_session_id)
+    return StreamingResponse(stream_job(job, offset, moves_encoding=moves_encoding), media_type="application/x-ndjson")
+
+
+@app.get("/api/jobs/{job_id}/problems/{problem_id}/state")
+async def get_board_state(job_id: str, problem_id: int, move: int = -1, x_session_id: str = Header("default")):
+    """Board of a solved problem after the given move index, -1 for the start, rebuilt from the nearest keyframe."""
+    job = get_job(job_id, x_session_id)
+    replay = replays.get((job.id, problem_id))
+    if replay is None:
+        problem = next((problem for problem in job.problems if problem["id"] == problem_id), None)
+        result = next((result for result in job.results if result["id"] == problem_id), None)
+        if problem is None or result is None:
+            raise HTTPException(status_code=404, detail="Problem not found or not solved yet")
+        # Results answered from the cache carry no keyframes, Replay then builds its own
+        replay = Replay(problem, result["moves"], result.get("keyframes"), KEYFRAME_INTERVAL)
+        replays.put((job.id, problem_id), replay)
+    try:
+        board = replay.stateAt(move)
+    except IndexError:
+        raise HTTPException(status_code=400, detail=f"Move index must be between -1 and {len(replay) - 1}")
+    return {"move": move, "total_moves": len(replay), "board": board}
+
+
+@app.delete("/api/jobs/{job_id}")
+async def cancel_job(job_id: str, x_session_id: str = Header("default")):
+    job = get_job(job_id, x_session_id)
+    job.cancel()
+    if job.task is not None:
+        await asyncio.wait([job.task])
+    return job.progress()
+
+
+@app.get("/api/metrics")
+async def get_metrics():
+    """Request, solver and cache metrics in the Prometheus text format."""
+    return Response(metrics.render(), media_type=CONTENT_TYPE)
 
 
 @app.get("/api/problem/{problem_id}")
-async def get_problem(problem_id: int):
-    global problems
-    for problem in problems:
+async def get_problem(problem_id: int, x_session_id: str = Header("default")):
+    for problem in sessions.get(x_session_id) or []:
         if problem["id"] == problem_id:
             return problem
     raise HTTPException(status_code=404, detail="Problem not found")
@@ -0,0 +1,62 @@
+# DESCRIPTION:	Checks MonteCarlo.sample_component against exact enumeration
+#				on a fixed frontier component.
+
+import itertools
+import random
+
+import MonteCarlo
+from ConstraintGraph import ConstraintGraph
+from MineProbability import mine_probabilities
+
+
+WIDTH = 14
+PLANTED = {1, 4, 5, 9, 12}
+INTERIOR = 20
+MINES_REMAINING = 10
+
+
+def wallComponent() -> "tuple": # type: ignore
+	""" A strip of WIDTH covered tiles below every other cell of a numbered row, numbered from PLANTED """
+	graph = ConstraintGraph()
+	for column in range(0, WIDTH, 2):
+		tiles = {(1, c) for c in range(column - 1, column + 2) if 0 <= c < WIDTH}
+		graph.addConstraint((0, column), tiles, sum(tile[1] in PLANTED for tile in tiles))
+	return sorted(graph.tileCells), sorted(graph.cellTiles), graph
+
+
+def enumeratedCounts(tiles: list, graph: ConstraintGraph) -> dict:
+	""" Counts of the component in the format of MyAI.forward_checking, by trying every assignment """
+	counts = {"tiles": set(tiles), "solutions": 0, "totals": {}, "tile_mines_by_total": {}}
+	for assignment in itertools.product((False, True), repeat=len(tiles)):
+		mines = {tile for tile, isMine in zip(tiles, assignment) if isMine}
+		if all(len(mines & cellTiles) == graph.cellMines[cell] for cell, cellTiles in graph.cellTiles.items()):
+			counts["solutions"] += 1
+			counts["totals"][len(mines)] = counts["totals"].get(len(mines), 0) + 1
+			tileMines = counts["tile_mines_by_total"].setdefault(len(mines), {})
+			for tile in mines:
+				tileMines[tile] = tileMines.get(tile, 0) + 1
+	return counts
+
+
+def test_sample_component_matches_enumeration():
+	tiles, cells, graph = wallComponent()
+	interior = [("interior", i) for i in range(INTERIOR)]
+	exact = mine_probabilities([enumeratedCounts(tiles, graph)], interior, MINES_REMAINING)
+
+	sampled = MonteCarlo.sample_component(tiles, cells, graph, INTERIOR, MINES_REMAINING, 1.0, random.Random(0), 100)
+	assert sampled["effective_samples"] >= 100
+	estimate = mine_probabilities([sampled], interior, MINES_REMAINING)
+	for tile in tiles:
+		assert abs(estimate[tile] - exact[tile]) < 0.06, tile
+
+	intervals = MonteCarlo.probability_intervals([sampled], interior, MINES_REMAINING)
+	# 95% intervals from 8 batches, so a few tiles may fall outside
+	covered = sum(intervals[tile][0] <= exact[tile] <= intervals[tile][1] for tile in tiles)
+	assert covered >= len(tiles) - 4
+
+
+def test_sample_component_stops_halfway_when_short_of_samples():
+	tiles, cells, graph = wallComponent()
+	sampled = MonteCarlo.sample_component(tiles, cells, graph, INTERIOR, MINES_REMAINING, 0.05, random.Random(0), 1e9)
+	assert len(sampled["batches"]) == MonteCarlo.BATCHES // 2
+	assert sampled["effective_samples"] < 1e9
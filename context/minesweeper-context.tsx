@@ -1,7 +1,8 @@
 "use client"
 
 import { createContext, useContext, useState, useRef, type ReactNode } from "react"
-import { generateProblems, processProblems } from "@/app/actions"
+import { generateProblems } from "@/app/actions"
+import { decodeMoves } from "@/lib/move-log"
 
 type MoveType = {
   x: number
@@ -57,6 +58,15 @@ export function MinesweeperProvider({ children }: { children: ReactNode }) {
   // Ref to store the playback interval
   const playIntervalRef = useRef<NodeJS.Timeout | null>(null)
 
+  // Identifies this tab to the backend, which keeps generated problems and jobs per session
+  const sessionIdRef = useRef<string>("")
+  const getSessionId = () => {
+    if (!sessionIdRef.current) {
+      sessionIdRef.current = crypto.randomUUID()
+    }
+    return sessionIdRef.current
+  }
+
   // Helper function to transpose a 2D array.
   function transpose(grid: number[][]): number[][] {
     return grid[0].map((_, colIndex) => grid.map(row => row[colIndex]));
@@ -66,7 +76,7 @@ export function MinesweeperProvider({ children }: { children: ReactNode }) {
   const handleGenerate = async () => {
     setIsProcessing(true)
     try {
-      const data = await generateProblems(difficulty, problemCount)
+      const data = await generateProblems(difficulty, problemCount, getSessionId())
       // Reverse the grid rows (to match backend vertical flip) and then transpose (swap x and y).
       const initialProblems = Array.from({ length: problemCount }, (_, i) => ({
         id: i,
@@ -95,51 +105,59 @@ export function MinesweeperProvider({ children }: { children: ReactNode }) {
         return
       }
 
-      const data = await processProblems()
+      // Clear earlier results; every game is filled in as soon as its result line arrives,
+      // so playback of a finished game can start while the rest are still being solved
+      setProblems((prev) => prev.map((problem) => ({ ...problem, moves: [], outcome: null })))
+      setCurrentProblemIndex(0)
+      setCurrentMoveIndex(-1)
+      setCurrentGrid(problems[0].grid)
 
-      if (!data || !data.results || !Array.isArray(data.results)) {
-        console.error("Invalid response data structure:", data)
-        throw new Error("Invalid response from server")
+      // Moves come as compact base64 records, a fraction of the size of JSON move objects
+      const response = await fetch("/api/process/stream?moves_encoding=binary", {
+        method: "POST",
+        headers: { "X-Session-Id": getSessionId() },
+        cache: "no-store",
+      })
+      if (!response.ok || !response.body) {
+        const errorText = await response.text()
+        throw new Error(`Failed to process problems: ${response.status} - ${errorText}`)
       }
 
-      if (data.results.length !== problems.length) {
-        console.error("Mismatch in problem and result counts", {
-          problemsCount: problems.length,
-          resultsCount: data.results.length,
-        })
-
-        const paddedResults = problems.map((problem, index) =>
-          data.results[index] || {
-            id: problem.id,
-            moves: [],
-            outcome: null,
+      const reader = response.body.pipeThrough(new TextDecoderStream()).getReader()
+      let buffer = ""
+      let received = 0
+      while (true) {
+        const { done, value } = await reader.read()
+        if (done) break
+        buffer += value
+        const lines = buffer.split("\n")
+        buffer = lines.pop() ?? ""
+
+        // Apply every complete line of this chunk in a single state update
+        const chunkResults = new Map<number, { moves?: MoveType[]; outcome?: ProblemType["outcome"] }>()
+        for (const line of lines) {
+          if (!line.trim()) continue
+          const result = JSON.parse(line)
+          if (result.moves_encoding === "binary") {
+            result.moves = decodeMoves(result.moves)
           }
+          chunkResults.set(result.id, result)
+        }
+        if (chunkResults.size === 0) continue
+        received += chunkResults.size
+        setProblems((prev) =>
+          prev.map((problem) => {
+            const result = chunkResults.get(problem.id)
+            return result ? { ...problem, moves: result.moves || [], outcome: result.outcome || null } : problem
+          })
         )
-
-        const updatedProblems = problems.map((problem, index) => ({
-          ...problem,
-          moves: paddedResults[index].moves || [],
-          outcome: paddedResults[index].outcome || null,
-        }))
-
-        console.log("Updated Problems:", updatedProblems)
-        setProblems(updatedProblems)
-      } else {
-        const updatedProblems = problems.map((problem, index) => ({
-          ...problem,
-          moves: data.results[index].moves || [],
-          outcome: data.results[index].outcome || null,
-        }))
-
-        console.log("Updated Problems:", updatedProblems)
-        setProblems(updatedProblems)
       }
 
-      // Reset for playback
-      setCurrentProblemIndex(0)
-      setCurrentMoveIndex(-1)
-      if (problems.length > 0) {
-        setCurrentGrid(problems[0].grid)
+      if (received !== problems.length) {
+        console.error("Mismatch in problem and result counts", {
+          problemsCount: problems.length,
+          resultsCount: received,
+        })
       }
     } catch (error) {
       console.error("Error processing problems:", error)
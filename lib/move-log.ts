@@ -0,0 +1,36 @@
+// Decoder for the compact move logs the backend sends with ?moves_encoding=binary (backend/MoveLog.py).
+// Every move is a 5-byte little-endian record: uint16 x, uint16 y, then one byte whose low 4 bits are
+// the tile number (15 when there is none) and whose high 4 bits are the move type.
+
+export type DecodedMove = {
+  x: number
+  y: number
+  type: "reveal" | "flag" | "exploded"
+  result?: string
+}
+
+const RECORD_SIZE = 5
+const MOVE_TYPES = ["reveal", "flag", "exploded"] as const
+const NO_RESULT = 15
+
+export function decodeMoves(base64: string): DecodedMove[] {
+  const binary = atob(base64)
+  const bytes = new Uint8Array(binary.length)
+  for (let i = 0; i < binary.length; i++) {
+    bytes[i] = binary.charCodeAt(i)
+  }
+
+  const view = new DataView(bytes.buffer)
+  const moves: DecodedMove[] = []
+  for (let offset = 0; offset + RECORD_SIZE <= bytes.length; offset += RECORD_SIZE) {
+    const kind = view.getUint8(offset + 4)
+    const number = kind & 0x0f
+    moves.push({
+      x: view.getUint16(offset, true),
+      y: view.getUint16(offset + 2, true),
+      type: MOVE_TYPES[kind >> 4],
+      result: number === NO_RESULT ? "" : String(number),
+    })
+  }
+  return moves
+}